@@ -0,0 +1,132 @@
+# Synthetic 32-bit x86 code for benchmarking. Functions are built from a small set of
+# common instruction forms, which instruction_length() can decode.
+from array import array
+import os
+import random
+import struct
+
+# Opcodes without a ModRM byte, and their full length
+FIXED_LENGTHS = {0x90: 1, 0xC3: 1, 0xC9: 1, 0xCC: 1, 0xC2: 3, 0x6A: 2, 0x68: 5, 0xA1: 5,
+                 0xE8: 5, 0xE9: 5, 0xEB: 2, 0x74: 2, 0x75: 2}
+for op in range(0x50, 0x60):
+    FIXED_LENGTHS[op] = 1
+for op in range(0xB8, 0xC0):
+    FIXED_LENGTHS[op] = 5
+
+# Opcodes followed by a ModRM byte, and the size of their immediate
+MODRM_IMMEDIATES = {0x03: 0, 0x2B: 0, 0x33: 0, 0x3B: 0, 0x85: 0, 0x89: 0, 0x8B: 0, 0x8D: 0, 0xFF: 0,
+                    0x83: 1, 0xC7: 4}
+
+REGS = [0, 1, 2, 3, 6, 7]
+
+def modrm_length(modrm):
+    mod = modrm >> 6
+    if mod == 0:
+        return 5 if (modrm & 7) == 5 else 1
+    if mod == 1:
+        return 2
+    if mod == 2:
+        return 5
+    return 1
+
+def instruction_length(data, offset):
+    op = data[offset]
+    if op == 0x0F:
+        return 6
+    if op in FIXED_LENGTHS:
+        return FIXED_LENGTHS[op]
+    if op in MODRM_IMMEDIATES and offset + 1 < len(data):
+        return 1 + modrm_length(data[offset + 1]) + MODRM_IMMEDIATES[op]
+    return 1
+
+class CorpusBuilder:
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.code = bytearray()
+        self.relocs = array('I')
+        self.functions = array('I')
+        self.imports = [0x10400000 + 4 * i for i in range(512)]
+
+    def emit(self, data, reloc_offset=None):
+        if reloc_offset is not None:
+            self.relocs.append(len(self.code) + reloc_offset)
+        self.code += data
+
+    def emit_instruction(self):
+        rng = self.rng
+        kind = rng.random()
+        reg = rng.choice(REGS)
+        if kind < 0.30:
+            # mov/lea/arith reg, [ebp+disp8] or [ebp-disp8]
+            op = rng.choice([0x8B, 0x89, 0x8D, 0x03, 0x2B, 0x3B])
+            self.emit(bytes([op, 0x45 | (reg << 3), rng.randrange(256) & 0xFC]))
+        elif kind < 0.45:
+            # reg, reg forms
+            op = rng.choice([0x8B, 0x33, 0x85, 0x3B, 0x03])
+            self.emit(bytes([op, 0xC0 | (reg << 3) | rng.choice(REGS)]))
+        elif kind < 0.55:
+            self.emit(bytes([0xE8]) + struct.pack('<i', rng.randrange(-0x100000, 0x100000)))
+        elif kind < 0.60:
+            # call [import], relocated
+            self.emit(bytes([0xFF, 0x15]) + struct.pack('<I', rng.choice(self.imports)), 2)
+        elif kind < 0.64:
+            # mov eax, [global], relocated
+            self.emit(bytes([0xA1]) + struct.pack('<I', 0x10500000 + 4 * rng.randrange(0x4000)), 1)
+        elif kind < 0.70:
+            self.emit(bytes([0x6A, rng.randrange(0x40)]))
+        elif kind < 0.74:
+            # push offset string, relocated
+            self.emit(bytes([0x68]) + struct.pack('<I', 0x10600000 + rng.randrange(0x100000)), 1)
+        elif kind < 0.82:
+            self.emit(bytes([rng.choice([0x74, 0x75, 0xEB]), rng.randrange(0x80)]))
+        elif kind < 0.86:
+            self.emit(bytes([0x0F, rng.choice([0x84, 0x85])]) + struct.pack('<i', rng.randrange(0x80, 0x1000)))
+        elif kind < 0.92:
+            self.emit(bytes([0x83, 0xC0 | (rng.choice([0, 5, 7]) << 3) | reg, rng.randrange(0x80)]))
+        elif kind < 0.96:
+            self.emit(bytes([0xB8 | reg]) + struct.pack('<I', rng.randrange(0x1000)))
+        else:
+            self.emit(bytes([0xC7, 0x45, rng.randrange(256) & 0xFC]) + struct.pack('<I', rng.choice([0, 1, 0xFFFFFFFF, rng.randrange(0x10000)])))
+
+    def emit_function(self):
+        rng = self.rng
+        self.functions.append(len(self.code))
+        self.emit(b'\x55\x8B\xEC')
+        if rng.random() < 0.6:
+            self.emit(bytes([0x83, 0xEC, rng.randrange(4, 0x80) & 0xFC]))
+        for i in range(int(rng.expovariate(1 / 40)) + 2):
+            self.emit_instruction()
+        self.emit(rng.choice([b'\x8B\xE5\x5D\xC3', b'\xC9\xC3', b'\x5D\xC3']))
+        self.functions.append(len(self.code))
+        while len(self.code) % 16 != 0:
+            self.emit(b'\xCC')
+
+    def build(self, size):
+        while len(self.code) < size:
+            self.emit_function()
+        return bytes(self.code), self.relocs, self.functions
+
+def load_corpus(size, seed=1, cache_dir=None):
+    # Returns (code, relocation offsets, [function start, end, ...]), cached on disk
+    if cache_dir is not None:
+        path = os.path.join(cache_dir, 'makesig-corpus-%i-%i' % (size, seed))
+        if os.path.exists(path + '.bin'):
+            relocs = array('I')
+            functions = array('I')
+            with open(path + '.bin', 'rb') as f:
+                code = f.read()
+            with open(path + '.relocs', 'rb') as f:
+                relocs.frombytes(f.read())
+            with open(path + '.funcs', 'rb') as f:
+                functions.frombytes(f.read())
+            return code, relocs, functions
+    
+    code, relocs, functions = CorpusBuilder(seed).build(size)
+    if cache_dir is not None:
+        with open(path + '.relocs', 'wb') as f:
+            f.write(relocs.tobytes())
+        with open(path + '.funcs', 'wb') as f:
+            f.write(functions.tobytes())
+        with open(path + '.bin', 'wb') as f:
+            f.write(code)
+    return code, relocs, functions
@@ -0,0 +1,224 @@
+# Stand-in for the parts of the Binary Ninja API used by makesig, so it can be benchmarked
+# without a Binary Ninja license. install() must run before makesig is imported.
+from bisect import bisect_right
+import enum
+import json
+import struct
+import sys
+import threading
+import types
+
+class FindFlag(enum.IntEnum):
+    FindCaseSensitive = 0
+    FindCaseInsensitive = 1
+
+class Segment:
+    def __init__(self, start, end, executable):
+        self.start = start
+        self.end = end
+        self.executable = executable
+        self.readable = True
+        self.writable = not executable
+
+    def __len__(self):
+        return self.end - self.start
+
+class Section:
+    def __init__(self, name, start, end):
+        self.name = name
+        self.start = start
+        self.end = end
+
+    def __len__(self):
+        return self.end - self.start
+
+class BasicBlock:
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+
+class Function:
+    def __init__(self, start, end, name):
+        self.start = start
+        self.name = name
+        self.basic_blocks = [BasicBlock(start, end)]
+
+    def __iter__(self):
+        return iter(self.basic_blocks)
+
+class FileMetadata:
+    def __init__(self, filename=''):
+        self.filename = filename
+
+    def close(self):
+        pass
+
+class BinaryView:
+    def __init__(self, data, start, instruction_length, reloc_starts, reloc_size=4, functions=(), view_type='PE'):
+        # The whole buffer is mapped as a single executable .text segment
+        self.data = data
+        self.start = start
+        self.end = start + len(data)
+        self.view_type = view_type
+        self.segments = [Segment(self.start, self.end, True)]
+        self.sections = {'.text': Section('.text', self.start, self.end)}
+        self.functions = list(functions)
+        self.session_data = {}
+        self.file = FileMetadata()
+        self.instruction_length = instruction_length
+        self.reloc_starts = reloc_starts
+        self.reloc_size = reloc_size
+
+    def __len__(self):
+        return len(self.data)
+
+    def read(self, addr, length):
+        offset = addr - self.start
+        if offset < 0:
+            return b''
+        return self.data[offset:offset + length]
+
+    def find_next_data(self, start, data, flags=FindFlag.FindCaseSensitive):
+        if isinstance(data, str):
+            data = data.encode('charmap')
+        offset = self.data.find(data, max(start - self.start, 0))
+        return None if offset == -1 else self.start + offset
+
+    def get_instruction_length(self, addr, arch=None):
+        return self.instruction_length(self.data, addr - self.start)
+
+    @property
+    def relocation_ranges(self):
+        return [(self.start + offset, self.start + offset + self.reloc_size) for offset in self.reloc_starts]
+
+    def relocation_ranges_at(self, addr):
+        i = bisect_right(self.reloc_starts, addr - self.start) - 1
+        if i >= 0 and self.reloc_starts[i] + self.reloc_size > addr - self.start:
+            offset = self.reloc_starts[i]
+            return [(self.start + offset, self.start + offset + self.reloc_size)]
+        return []
+
+    def get_segment_at(self, addr):
+        for segment in self.segments:
+            if segment.start <= addr < segment.end:
+                return segment
+        return None
+
+    def register_notification(self, notification):
+        pass
+
+    def unregister_notification(self, notification):
+        pass
+
+class BinaryReader:
+    def __init__(self, bv, endian=None):
+        self.bv = bv
+        self.offset = bv.start
+
+    def seek(self, offset):
+        self.offset = offset
+
+    def read(self, length):
+        data = self.bv.read(self.offset, length)
+        self.offset += len(data)
+        return data
+
+    def read_int(self, fmt, size):
+        data = self.bv.read(self.offset, size)
+        if len(data) < size:
+            return None
+        self.offset += size
+        return struct.unpack(fmt, data)[0]
+
+    def read8(self):
+        return self.read_int('<B', 1)
+
+    def read16(self):
+        return self.read_int('<H', 2)
+
+    def read32(self):
+        return self.read_int('<I', 4)
+
+    def read64(self):
+        return self.read_int('<Q', 8)
+
+class BinaryDataNotification:
+    def __init__(self, *args, **kwargs):
+        pass
+
+class BackgroundTaskThread(threading.Thread):
+    def __init__(self, initial_progress_text='', can_cancel=False):
+        threading.Thread.__init__(self)
+        self.progress = initial_progress_text
+        self.can_cancel = can_cancel
+        self.cancelled = False
+
+    def finish(self):
+        pass
+
+class Settings:
+    values = {}
+
+    def register_group(self, group, title):
+        return True
+
+    def register_setting(self, key, properties):
+        Settings.values.setdefault(key, json.loads(properties).get('default'))
+        return True
+
+    def get_bool(self, key, view=None):
+        return bool(Settings.values[key])
+
+    def get_integer(self, key, view=None):
+        return int(Settings.values[key])
+
+    def get_string(self, key, view=None):
+        return Settings.values[key]
+
+    def get_string_list(self, key, view=None):
+        return list(Settings.values[key])
+
+    def set_bool(self, key, value, view=None):
+        Settings.values[key] = value
+
+class PluginCommand:
+    @staticmethod
+    def register(*args, **kwargs):
+        pass
+
+    @staticmethod
+    def register_for_function(*args, **kwargs):
+        pass
+
+    @staticmethod
+    def register_for_address(*args, **kwargs):
+        pass
+
+    @staticmethod
+    def register_for_range(*args, **kwargs):
+        pass
+
+class interaction:
+    @staticmethod
+    def get_text_line_input(prompt, title):
+        return None
+
+    @staticmethod
+    def get_open_filename_input(prompt, ext=''):
+        return None
+
+    @staticmethod
+    def get_save_filename_input(prompt, ext='', default_name=''):
+        return None
+
+def load(path, *args, **kwargs):
+    raise NotImplementedError('Opening files needs Binary Ninja')
+
+def install():
+    module = types.ModuleType('binaryninja')
+    for name in ['FindFlag', 'Segment', 'Section', 'BasicBlock', 'Function', 'FileMetadata', 'BinaryView',
+                 'BinaryReader', 'BinaryDataNotification', 'BackgroundTaskThread', 'Settings', 'PluginCommand',
+                 'interaction', 'load']:
+        setattr(module, name, globals()[name])
+    sys.modules['binaryninja'] = module
+    return module
@@ -0,0 +1,132 @@
+# Benchmarks makesig's signature search and generation on synthetic x86 code, no Binary Ninja
+# needed. Run from the repository root:
+#
+#   python bench/run.py --sizes 1 10 --save results.json
+#   python bench/run.py --sizes 1 10 --compare results.json
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fakebinja
+fakebinja.install()
+
+from corpus import instruction_length, load_corpus
+import makesig
+
+IMAGE_BASE = 0x10001000
+
+def make_view(size, seed, cache_dir):
+    code, relocs, bounds = load_corpus(size, seed, cache_dir)
+    functions = [fakebinja.Function(IMAGE_BASE + bounds[i], IMAGE_BASE + bounds[i + 1], 'sub_%x' % (IMAGE_BASE + bounds[i]))
+                 for i in range(0, len(bounds), 2)]
+    return fakebinja.BinaryView(code, IMAGE_BASE, instruction_length, relocs, functions=functions)
+
+def sample_sigs(bv, funcs, length, leading_wildcards=0):
+    sigs = []
+    for func in funcs:
+        data, mask, instr_ends = makesig.get_function_bytes(bv, func)
+        mask = bytearray(mask[:length])
+        mask[:leading_wildcards] = b'\x01' * leading_wildcards
+        sigs += [makesig.Signature(data[:length], mask)]
+    return sigs
+
+def timed(fn):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()
+    return time.perf_counter() - start
+
+def run_benchmarks(bv, samples, seed):
+    code_size = len(bv.data)
+    funcs = random.Random(seed).sample(bv.functions, samples)
+    results = {}
+    
+    results['code_cache'] = timed(lambda: makesig.get_code_cache(bv).get_byte_freqs())
+    
+    sigs = sample_sigs(bv, funcs, 16)
+    results['find_sig'] = timed(lambda: [makesig.find_sig(bv, sig, max_results=2) for sig in sigs])
+    
+    sigs = sample_sigs(bv, funcs, 16, leading_wildcards=2)
+    results['find_sig_wildcard_start'] = timed(lambda: [makesig.find_sig(bv, sig, max_results=2) for sig in sigs])
+    
+    sigs = sample_sigs(bv, funcs, 8)
+    results['is_good_sig_short'] = timed(lambda: [makesig.is_good_sig(bv, sig) for sig in sigs])
+    
+    named_sigs = [('sig%i' % i, sig) for i, sig in enumerate(sample_sigs(bv, funcs, 16))]
+    results['find_sigs'] = timed(lambda: makesig.find_sigs(bv, named_sigs, max_results=2))
+    
+    results['sig_for_function'] = timed(lambda: [makesig.sig_for_function(bv, func) for func in funcs])
+    results['shortest_sig_for_function'] = timed(lambda: [makesig.shortest_sig_for_function(bv, func) for func in funcs])
+    
+    # Scan throughput over the whole code for the search benchmarks, per-function time for generation
+    report = {}
+    for name, elapsed in results.items():
+        if name in ['find_sig', 'find_sig_wildcard_start', 'is_good_sig_short']:
+            report[name] = {'seconds': elapsed, 'mb_per_s': code_size * samples / elapsed / (1 << 20)}
+        elif name in ['sig_for_function', 'shortest_sig_for_function']:
+            report[name] = {'seconds': elapsed, 'ms_per_function': elapsed * 1000 / samples}
+        else:
+            report[name] = {'seconds': elapsed}
+    return report
+
+def print_report(size, report):
+    print('%i MB corpus' % size)
+    for name, values in report.items():
+        extra = ''
+        if 'mb_per_s' in values:
+            extra = '%10.1f MB/s' % values['mb_per_s']
+        elif 'ms_per_function' in values:
+            extra = '%10.2f ms/function' % values['ms_per_function']
+        print('  %-28s %9.3f s %s' % (name, values['seconds'], extra))
+
+def compare_reports(reports, baseline, tolerance):
+    # Returns the number of benchmarks more than `tolerance` slower than the baseline
+    regressions = 0
+    for size, report in reports.items():
+        for name, values in report.items():
+            old = baseline.get(size, {}).get(name)
+            if old is None:
+                continue
+            ratio = values['seconds'] / old['seconds'] if old['seconds'] > 0 else 1
+            if ratio > 1 + tolerance:
+                print('REGRESSION %s MB %s: %.3f s -> %.3f s (%.0f%% slower)' % (size, name, old['seconds'], values['seconds'], (ratio - 1) * 100))
+                regressions += 1
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark makesig on synthetic x86 code')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100], help='corpus sizes in MB')
+    parser.add_argument('--samples', type=int, default=50, help='functions/signatures per benchmark')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--cache-dir', default=tempfile.gettempdir(), help='where generated corpora are kept')
+    parser.add_argument('--save', help='write results as JSON')
+    parser.add_argument('--compare', help='JSON results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='slowdown that counts as a regression')
+    args = parser.parse_args()
+    
+    reports = {}
+    for size in args.sizes:
+        bv = make_view(size << 20, args.seed, args.cache_dir)
+        reports[str(size)] = run_benchmarks(bv, args.samples, args.seed)
+        print_report(size, reports[str(size)])
+    
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(reports, f, indent=4)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare_reports(reports, baseline, args.tolerance) > 0:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
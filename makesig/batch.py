@@ -0,0 +1,118 @@
+from binaryninja import *
+from concurrent.futures import ProcessPoolExecutor
+from .codecache import *
+from .function import *
+from .generator import *
+from .gamedata import *
+import argparse
+import csv
+import multiprocessing
+import os
+import re
+import time
+
+worker_cache = None
+
+def init_worker(regions, byte_freqs, index):
+    # Each worker keeps its own read-only copy of the code for the whole batch
+    global worker_cache
+    worker_cache = CodeCache(regions)
+    worker_cache.byte_freqs = byte_freqs
+    worker_cache.index = index
+
+def make_sig_job(job):
+    name, addr, data, mask, instr_ends, shortest = job
+    start_time = time.perf_counter()
+    if shortest:
+        sig, count, probes = shortest_sig(worker_cache, data, mask, instr_ends)
+    else:
+        sig, count = grow_sig(worker_cache, data, mask, instr_ends)
+    elapsed = time.perf_counter() - start_time
+    return name, addr, str(sig) if count == 1 else None, len(sig) if sig is not None else 0, count, elapsed
+
+def filter_functions(bv, symbol_filter=None):
+    if symbol_filter is None:
+        return list(bv.functions)
+    pattern = re.compile(symbol_filter)
+    return [func for func in bv.functions if pattern.search(func.name)]
+
+def make_sigs(bv, funcs, workers=None, shortest=False, progress=None):
+    # Collecting the function bytes needs the API, so it stays in this process
+    jobs = []
+    for func in funcs:
+        data, mask, instr_ends = get_function_bytes(bv, func)
+        jobs += [(func.name, func.start, bytes(data), bytes(mask), instr_ends, shortest)]
+    
+    cache = get_code_cache(bv)
+    worker_args = (cache.regions, cache.get_byte_freqs(), cache.index)
+    results = []
+    if workers == 1:
+        init_worker(*worker_args)
+        for job in jobs:
+            results += [make_sig_job(job)]
+            if progress is not None and not progress(len(results), len(jobs)):
+                break
+    else:
+        # Spawned rather than forked, the Binary Ninja core isn't safe to use after a fork
+        with ProcessPoolExecutor(workers, initializer=init_worker, initargs=worker_args, mp_context=multiprocessing.get_context('spawn')) as executor:
+            for result in executor.map(make_sig_job, jobs, chunksize=16):
+                results += [result]
+                if progress is not None:
+                    progress(len(results), len(jobs))
+    return results
+
+def write_timing_csv(path, results):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['name', 'address', 'signature', 'length', 'matches', 'seconds'])
+        for name, addr, sig, length, count, elapsed in results:
+            writer.writerow([name, '0x%x' % addr, sig or '', length, count, '%.6f' % elapsed])
+
+def write_batch_results(bv, results, gamedata_path, csv_path):
+    sigs = [(name, sig) for name, addr, sig, length, count, elapsed in results if sig is not None]
+    write_gamedata(gamedata_path, sigs, get_platform_name(bv))
+    write_timing_csv(csv_path, results)
+    print('Generated %i/%i signatures' % (len(sigs), len(results)))
+
+class MakeSigsTask(BackgroundTaskThread):
+    def __init__(self, msg, bv, gamedata_path):
+        BackgroundTaskThread.__init__(self, msg, True)
+        self.bv = bv
+        self.gamedata_path = gamedata_path
+
+    def update_progress(self, done, total):
+        self.progress = 'Generating signatures (%i/%i)' % (done, total)
+        return not self.cancelled
+
+    def run(self):
+        # Binary Ninja's embedded interpreter can't spawn worker processes, so run in-process
+        results = make_sigs(self.bv, self.bv.functions, workers=1, progress=self.update_progress)
+        write_batch_results(self.bv, results, self.gamedata_path, os.path.splitext(self.gamedata_path)[0] + '.csv')
+
+def command_make_sigs(bv):
+    path = interaction.get_save_filename_input('Save gamedata', 'txt')
+    if not path:
+        return
+    task = MakeSigsTask('Generating signatures', bv, path)
+    task.start()
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate signatures for every function in a Binary Ninja database')
+    parser.add_argument('database', help='.bndb or binary to open')
+    parser.add_argument('gamedata', help='gamedata file to write')
+    parser.add_argument('--csv', help='per-function timing CSV (default: next to the gamedata file)')
+    parser.add_argument('--filter', help='only sign functions whose name matches this regex')
+    parser.add_argument('--workers', type=int, help='number of worker processes (default: CPU count)')
+    parser.add_argument('--shortest', action='store_true', help='search for the shortest unique signature')
+    args = parser.parse_args()
+    
+    bv = load(args.database)
+    try:
+        funcs = filter_functions(bv, args.filter)
+        results = make_sigs(bv, funcs, args.workers, args.shortest)
+        write_batch_results(bv, results, args.gamedata, args.csv or os.path.splitext(args.gamedata)[0] + '.csv')
+    finally:
+        bv.file.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+BYTE_COUNT_CHUNK_SIZE = 1 << 22
+
+class CodeRegion:
+    def __init__(self, start, data, offset=0, size=None):
+        # The region is data[offset:offset + size], which lets data be a whole memory-mapped
+        # file without copying each section out of it. Offsets passed to the methods below
+        # are relative to the start of the region.
+        self.start = start
+        self.data = data
+        self.offset = offset
+        self.size = len(data) - offset if size is None else size
+        self.end = start + self.size
+
+    def __len__(self):
+        return self.size
+
+    def find(self, sub, start, end):
+        end = min(end, self.size)
+        if start > end:
+            return -1
+        found = self.data.find(sub, self.offset + start, self.offset + end)
+        return -1 if found == -1 else found - self.offset
+
+    def startswith(self, sub, pos):
+        if self.offset == 0 and isinstance(self.data, bytes):
+            return self.data.startswith(sub, pos)
+        if pos < 0 or pos + len(sub) > self.size:
+            return False
+        return self.data[self.offset + pos:self.offset + pos + len(sub)] == sub
+
+    def match(self, pattern, pos):
+        if pos < 0:
+            return None
+        return pattern.match(self.data, self.offset + pos, self.offset + self.size)
+
+    def read(self, start, end):
+        start = max(start, 0)
+        end = min(end, self.size)
+        return bytes(self.data[self.offset + start:self.offset + end])
+
+    def view(self):
+        return memoryview(self.data)[self.offset:self.offset + self.size]
+
+    def get_byte_counts(self):
+        counts = [0] * 256
+        if numpy is not None:
+            # bincount widens its input, so only a chunk at a time
+            code = numpy.frombuffer(self.data, dtype=numpy.uint8, count=self.size, offset=self.offset)
+            for chunk_start in range(0, self.size, BYTE_COUNT_CHUNK_SIZE):
+                chunk_counts = numpy.bincount(code[chunk_start:chunk_start + BYTE_COUNT_CHUNK_SIZE], minlength=256)
+                counts = [total + int(count) for total, count in zip(counts, chunk_counts)]
+            return counts
+        for chunk_start in range(0, self.size, BYTE_COUNT_CHUNK_SIZE):
+            chunk = self.read(chunk_start, chunk_start + BYTE_COUNT_CHUNK_SIZE)
+            for b in range(256):
+                counts[b] += chunk.count(bytes([b]))
+        return counts
+
+class CodeCache:
+    def __init__(self, regions):
+        self.regions = regions
+        self.byte_freqs = None
+        self.index = None
+        self.reloc_masks = None
+        # Threads to scan with, see Signature.iter_region_matches
+        self.workers = 1
+
+    def get_byte_freqs(self):
+        # Byte histogram of the code, used to estimate how common a run of bytes is
+        if self.byte_freqs is None:
+            freqs = [0] * 256
+            for region in self.regions:
+                counts = region.get_byte_counts()
+                for b in range(256):
+                    freqs[b] += counts[b]
+            self.byte_freqs = freqs
+        return self.byte_freqs
@@ -0,0 +1,123 @@
+from binaryninja import *
+from .code import *
+from .sigindex import *
+import os
+
+class CodeCacheInvalidator(BinaryDataNotification):
+    def data_written(self, view, offset, length):
+        invalidate_code_cache(view)
+
+    def data_inserted(self, view, offset, length):
+        invalidate_code_cache(view)
+
+    def data_removed(self, view, offset, length):
+        invalidate_code_cache(view)
+
+    def segment_added(self, view, segment):
+        invalidate_code_cache(view)
+
+    def segment_updated(self, view, segment):
+        invalidate_code_cache(view)
+
+    def segment_removed(self, view, segment):
+        invalidate_code_cache(view)
+
+def read_code_regions(bv, sections=None):
+    # Read every executable segment (or only the named sections) once so scans never go
+    # through the API per byte
+    regions = []
+    if sections:
+        for name in sections:
+            if name not in bv.sections:
+                print('Section %s not found' % name)
+                continue
+            section = bv.sections[name]
+            regions += [CodeRegion(section.start, bv.read(section.start, len(section)))]
+        regions.sort(key=lambda region: region.start)
+        return regions
+    
+    for seg in bv.segments:
+        if seg.executable:
+            regions += [CodeRegion(seg.start, bv.read(seg.start, len(seg)))]
+    return regions
+
+def read_relocation_masks(bv, regions):
+    # One byte per code byte, set where the loader will relocate it
+    masks = [bytearray(len(region)) for region in regions]
+    for start, end in bv.relocation_ranges:
+        for region, mask in zip(regions, masks):
+            lo = max(start, region.start)
+            hi = min(end, region.end)
+            if lo < hi:
+                mask[lo - region.start:hi - region.start] = b'\x01' * (hi - lo)
+    return masks
+
+def get_relocation_mask(bv, addr, length):
+    cache = get_code_cache(bv)
+    if cache.reloc_masks is None:
+        cache.reloc_masks = read_relocation_masks(bv, cache.regions)
+    for region, mask in zip(cache.regions, cache.reloc_masks):
+        if region.start <= addr and addr + length <= region.end:
+            return bytes(mask[addr - region.start:addr - region.start + length])
+    
+    # Not in an executable segment, fall back to asking per byte
+    return bytes(0 if len(bv.relocation_ranges_at(addr + i)) == 0 else 1 for i in range(length))
+
+def get_index_path(bv, sections=None):
+    if not bv.file.filename:
+        return None
+    if sections:
+        return '%s.%s.sigindex' % (bv.file.filename, '_'.join(name.strip('.') for name in sections))
+    return bv.file.filename + '.sigindex'
+
+def load_code_index(bv, regions, sections=None):
+    # Reuse the index saved next to the database unless the code has changed since
+    path = get_index_path(bv, sections)
+    index = None
+    if path is not None:
+        index = SuffixIndex.load(path, regions)
+    if index is None:
+        index = SuffixIndex.build(regions)
+        if path is not None:
+            # The binary may be in a read-only directory, the index still works from memory
+            try:
+                index.save(path)
+            except OSError as e:
+                print('Could not save signature index: %s' % e)
+    return index
+
+def get_scan_sections(bv):
+    # Sections to scan from the settings, an empty list means every executable segment
+    return tuple(Settings().get_string_list('makesig.sections', bv))
+
+def get_scan_workers(bv):
+    # 0 means a thread per CPU
+    workers = Settings().get_integer('makesig.scanWorkers', bv)
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return workers
+
+def get_code_cache(bv, sections=None):
+    if sections is None:
+        sections = get_scan_sections(bv)
+    sections = tuple(sections)
+    
+    caches = bv.session_data.get('makesig_code_cache')
+    if caches is None:
+        caches = {}
+        bv.session_data['makesig_code_cache'] = caches
+    cache = caches.get(sections)
+    if cache is None:
+        cache = CodeCache(read_code_regions(bv, sections))
+        if Settings().get_bool('makesig.useIndex', bv):
+            cache.index = load_code_index(bv, cache.regions, sections)
+        caches[sections] = cache
+        if bv.session_data.get('makesig_code_cache_invalidator') is None:
+            invalidator = CodeCacheInvalidator()
+            bv.register_notification(invalidator)
+            bv.session_data['makesig_code_cache_invalidator'] = invalidator
+    cache.workers = get_scan_workers(bv)
+    return cache
+
+def invalidate_code_cache(bv):
+    bv.session_data['makesig_code_cache'] = None
@@ -0,0 +1,26 @@
+from binaryninja import *
+from .codecache import *
+
+def get_function_end(func):
+    end = func.start
+    for bb in func:
+        if bb.end > end:
+            end = bb.end
+    return end
+
+def get_function_bytes(bv, func):
+    # Bytes of the function, a mask of the bytes that will be relocated and where each instruction ends
+    func_end = get_function_end(func)
+    data = bv.read(func.start, func_end - func.start)
+    mask = get_relocation_mask(bv, func.start, len(data))
+    instr_ends = []
+    curr_instr = func.start
+    while curr_instr < func.start + len(data):
+        instr_len = bv.get_instruction_length(curr_instr)
+        if instr_len == 0:
+            break
+        curr_instr += instr_len
+        instr_ends += [min(curr_instr - func.start, len(data))]
+    
+    length = instr_ends[-1] if len(instr_ends) > 0 else 0
+    return data[:length], mask[:length], instr_ends
@@ -0,0 +1,88 @@
+from .signature import *
+import heapq
+
+def count_mismatches(region, sig, pos):
+    data = region.read(pos, pos + len(sig))
+    return sum(1 for i in range(len(sig)) if not sig.mask[i] and data[i] != sig.data[i])
+
+def split_pieces(sig, count):
+    # Splits the literal bytes of the signature into count runs. With at most count - 1
+    # mismatches one of them has to match exactly.
+    pieces = sorted(sig.runs, key=lambda run: -len(run[1]))[:count]
+    while len(pieces) < count:
+        offset, run = pieces.pop(0)
+        if len(run) < 2:
+            pieces += [(offset, run)]
+            break
+        half = len(run) // 2
+        pieces += [(offset, run[:half]), (offset + half, run[half:])]
+        pieces.sort(key=lambda run: -len(run[1]))
+    return pieces
+
+def find_fuzzy_numpy(cache, sig, region, lo, hi, max_mismatches):
+    # Shift-Add over every offset at once: add up mismatches one signature byte at a time,
+    # rarest bytes first. Once max_mismatches + 1 bytes are counted only the offsets still
+    # within max_mismatches are kept and checked one by one.
+    freqs = cache.get_byte_freqs()
+    literals = sorted((i for i in range(len(sig)) if not sig.mask[i]), key=lambda i: freqs[sig.data[i]])
+    code = numpy.frombuffer(region.data, dtype=numpy.uint8, count=len(region), offset=region.offset)
+    
+    dense = literals[:max_mismatches + 1]
+    mismatches = numpy.zeros(hi - lo, dtype=numpy.uint16)
+    for i in dense:
+        mismatches += code[lo + i:hi + i] != sig.data[i]
+    candidates = numpy.flatnonzero(mismatches <= max_mismatches)
+    mismatches = mismatches[candidates]
+    candidates += lo
+    for i in literals[len(dense):]:
+        if candidates.size == 0:
+            break
+        mismatches += code[candidates + i] != sig.data[i]
+        keep = mismatches <= max_mismatches
+        candidates = candidates[keep]
+        mismatches = mismatches[keep]
+    return zip(candidates.tolist(), mismatches.tolist())
+
+def find_fuzzy_pieces(sig, region, lo, hi, max_mismatches):
+    # Without numpy, search for each piece exactly and count mismatches around every hit
+    pieces = split_pieces(sig, max_mismatches + 1)
+    if len(pieces) <= max_mismatches:
+        # Too few literal bytes to rule anything out
+        found = range(lo, hi)
+    else:
+        found = set()
+        for piece_offset, piece in pieces:
+            for hit in iter_find(region, piece, lo + piece_offset, hi - 1 + piece_offset + len(piece)):
+                found.add(hit - piece_offset)
+    for pos in sorted(found):
+        distance = count_mismatches(region, sig, pos)
+        if distance <= max_mismatches:
+            yield pos, distance
+
+def fuzzy_search(cache, sig, max_mismatches, max_results=10, start=None, end=None, progress=None):
+    # Returns up to max_results of (mismatches, address), closest first. Wildcards always match.
+    # Once max_results matches are found, only closer ones than the worst of them are looked for.
+    best = []
+    scanned = 0
+    for region in cache.regions:
+        lo = 0 if start is None else max(start - region.start, 0)
+        hi = len(region) if end is None else min(end - region.start, len(region))
+        hi -= len(sig)
+        for chunk_start in range(lo, hi + 1, SCAN_CHUNK_SIZE):
+            chunk_end = min(chunk_start + SCAN_CHUNK_SIZE, hi + 1)
+            limit = max_mismatches if len(best) < max_results else -best[0][0]
+            if numpy is not None:
+                matches = find_fuzzy_numpy(cache, sig, region, chunk_start, chunk_end, limit)
+            else:
+                matches = find_fuzzy_pieces(sig, region, chunk_start, chunk_end, limit)
+            
+            for pos, distance in matches:
+                item = (-distance, -(region.start + pos))
+                if len(best) < max_results:
+                    heapq.heappush(best, item)
+                elif item > best[0]:
+                    heapq.heapreplace(best, item)
+            scanned += chunk_end - chunk_start
+            if progress is not None and not progress(scanned, len(best)):
+                return sorted((-distance, -addr) for distance, addr in best)
+    return sorted((-distance, -addr) for distance, addr in best)
@@ -0,0 +1,128 @@
+import re
+
+PLATFORMS = ['windows', 'linux', 'mac']
+UNQUOTED_TOKEN = re.compile(r'[^\s{}"]+')
+
+def get_platform_name(bv):
+    if bv.view_type == 'PE':
+        return 'windows'
+    if bv.view_type == 'Mach-O':
+        return 'mac'
+    return 'linux'
+
+def get_library_filename(library, platform):
+    # Default file names of a library on each platform, e.g. server.dll and server_srv.so
+    if platform == 'windows':
+        return '%s.dll' % library
+    if platform == 'mac':
+        return '%s.dylib' % library
+    if library == 'server':
+        return 'server_srv.so'
+    return '%s.so' % library
+
+def write_gamedata(path, sigs, platform, library='server', game='#default'):
+    # SourceMod gamedata with a single Signatures section, sigs is a list of (name, signature)
+    with open(path, 'w') as f:
+        f.write('"Games"\n{\n')
+        f.write('\t"%s"\n\t{\n' % game)
+        f.write('\t\t"Signatures"\n\t\t{\n')
+        for name, sig in sigs:
+            f.write('\t\t\t"%s"\n\t\t\t{\n' % name)
+            f.write('\t\t\t\t"library"\t"%s"\n' % library)
+            f.write('\t\t\t\t"%s"\t"%s"\n' % (platform, sig))
+            f.write('\t\t\t}\n')
+        f.write('\t\t}\n')
+        f.write('\t}\n')
+        f.write('}\n')
+
+def tokenize_keyvalues(text):
+    # Yields quoted/unquoted strings and braces, skipping // and /* */ comments
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if c.isspace():
+            i += 1
+        elif text.startswith('//', i):
+            end = text.find('\n', i)
+            i = len(text) if end == -1 else end
+        elif text.startswith('/*', i):
+            end = text.find('*/', i)
+            i = len(text) if end == -1 else end + 2
+        elif c == '{' or c == '}':
+            yield c
+            i += 1
+        elif c == '"':
+            # Only \" is unescaped, signatures keep their \x escapes for Signature.parse
+            value = ''
+            i += 1
+            while i < len(text) and text[i] != '"':
+                if text[i] == '\\' and text.startswith('"', i + 1):
+                    i += 1
+                value += text[i]
+                i += 1
+            yield value
+            i += 1
+        else:
+            m = UNQUOTED_TOKEN.match(text, i)
+            yield m.group(0)
+            i = m.end()
+
+def parse_keyvalues(text):
+    # Returns a list of (key, value) where value is a string or a nested list
+    root = []
+    stack = [root]
+    key = None
+    for token in tokenize_keyvalues(text):
+        if token == '{':
+            section = []
+            stack[-1].append((key, section))
+            stack.append(section)
+            key = None
+        elif token == '}':
+            if len(stack) > 1:
+                stack.pop()
+        elif key is None:
+            key = token
+        else:
+            stack[-1].append((key, token))
+            key = None
+    return root
+
+def is_game_section(game_key, game_section, game=None):
+    # SourceMod only applies #default (or *) and the section named after the running game. A
+    # #supported block limits a section to the games it lists, only engines can't be checked.
+    if game_key.lower() not in ('#default', '*') and (game is None or game_key.lower() != game.lower()):
+        return False
+    supported = [value for key, value in game_section if key.lower() == '#supported' and isinstance(value, list)]
+    games = [value.lower() for entries in supported for key, value in entries if key.lower() == 'game' and isinstance(value, str)]
+    if len(games) == 0:
+        return True
+    return game is not None and game.lower() in games
+
+def read_gamedata_sigs(path, library='server', game=None):
+    # Returns {platform: {name: signature text}} from the sections SourceMod would load for the
+    # game folder (e.g. cstrike), later sections override earlier ones. Without a game only the
+    # #default sections are read.
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        kv = parse_keyvalues(f.read())
+    sigs = dict((platform, {}) for platform in PLATFORMS)
+    for games_key, games in kv:
+        if games_key.lower() != 'games' or not isinstance(games, list):
+            continue
+        for game_key, game_section in games:
+            if not isinstance(game_section, list) or not is_game_section(game_key, game_section, game):
+                continue
+            for section_key, section in game_section:
+                if section_key.lower() != 'signatures' or not isinstance(section, list):
+                    continue
+                for name, entry in section:
+                    if not isinstance(entry, list):
+                        continue
+                    values = dict((k.lower(), v) for k, v in entry if isinstance(v, str))
+                    # SourceMod treats entries without a library as server ones
+                    if values.get('library', 'server') != library:
+                        continue
+                    for platform in PLATFORMS:
+                        if platform in values:
+                            sigs[platform][name] = values[platform]
+    return sigs
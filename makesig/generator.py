@@ -0,0 +1,182 @@
+from .signature import *
+
+MIN_SIG_LENGTH = 5
+
+class CandidateSet:
+    def __init__(self, cache, sig, progress=None):
+        # Every place in the code the signature currently matches, grouped by region
+        self.length = len(sig)
+        self.matches = []
+        self.scanned = 0
+        self.cancelled = False
+        if cache is None:
+            return
+        
+        def on_progress(scanned, found):
+            self.scanned = scanned
+            self.cancelled = progress is not None and not progress(scanned, found)
+            return not self.cancelled
+        
+        for region, offset in sig.iter_region_matches(cache, progress=on_progress):
+            if len(self.matches) == 0 or self.matches[-1][0] is not region:
+                self.matches += [(region, [])]
+            self.matches[-1][1].append(offset)
+
+    def __len__(self):
+        return sum(len(offsets) for region, offsets in self.matches)
+
+    def addresses(self):
+        return [region.start + offset for region, offsets in self.matches for offset in offsets]
+
+    def copy(self):
+        candidates = CandidateSet(None, b'')
+        candidates.length = self.length
+        candidates.scanned = self.scanned
+        candidates.matches = [(region, list(offsets)) for region, offsets in self.matches]
+        return candidates
+
+    def extend(self, data, mask):
+        # Drop candidates that don't also match bytes appended to the signature
+        runs = [(self.length + offset, run) for offset, run in get_literal_runs(data, mask)]
+        self.length += len(data)
+        for region, offsets in self.matches:
+            last_start = len(region) - self.length
+            offsets[:] = [p for p in offsets if p <= last_start and all(region.startswith(run, p + offset) for offset, run in runs)]
+        self.matches = [(region, offsets) for region, offsets in self.matches if len(offsets) > 0]
+
+def report_progress(progress, *candidate_sets):
+    if progress is not None and not progress(sum(candidates.scanned for candidates in candidate_sets), sum(len(candidates) for candidates in candidate_sets)):
+        for candidates in candidate_sets:
+            candidates.cancelled = True
+    return not any(candidates.cancelled for candidates in candidate_sets)
+
+def grow_sig(cache, data, mask, instr_ends, progress=None):
+    sig, counts = grow_sig_all([cache], data, mask, instr_ends, progress)
+    return sig, None if counts is None else counts[0]
+
+def grow_sig_all(caches, data, mask, instr_ends, progress=None):
+    # Extend the signature an instruction at a time until only one match is left in every
+    # build. Each build keeps its own candidates so they are only scanned for once. Returns
+    # None, None if cancelled, and no signature if the function is too short for one.
+    builds = None
+    for instr_end in instr_ends:
+        if builds is None:
+            if instr_end < MIN_SIG_LENGTH:
+                continue
+            sig = Signature(data[:instr_end], mask[:instr_end])
+            builds = []
+            for cache in caches:
+                scanned = sum(candidates.scanned for candidates in builds)
+                on_progress = None if progress is None else lambda done, found, scanned=scanned: progress(scanned + done, found)
+                builds += [CandidateSet(cache, sig, on_progress)]
+                if builds[-1].cancelled:
+                    return None, None
+        else:
+            for candidates in builds:
+                candidates.extend(data[candidates.length:instr_end], mask[candidates.length:instr_end])
+        
+        if not report_progress(progress, *builds):
+            return None, None
+        # A build the signature no longer matches at all won't match again by growing it, so
+        # only the builds that still match need to be down to one
+        if all(len(candidates) <= 1 for candidates in builds) or len(builds[0]) == 0:
+            break
+    if builds is None:
+        return None, [0] * len(caches)
+    return Signature(data[:builds[0].length], mask[:builds[0].length]), [len(candidates) for candidates in builds]
+
+def shortest_sig(cache, data, mask, instr_ends, align=False, progress=None):
+    # Binary search for the shortest unique prefix. Match counts can only go down as the
+    # signature grows, and every probe only re-checks the matches of a shorter prefix.
+    probes = []
+    if len(data) < MIN_SIG_LENGTH:
+        return None, 0, probes
+    base = CandidateSet(cache, Signature(data[:MIN_SIG_LENGTH], mask[:MIN_SIG_LENGTH]), progress)
+    if not report_progress(progress, base):
+        return None, 0, probes
+    probes += [(base.length, len(base))]
+    
+    full = base.copy()
+    full.extend(data[base.length:], mask[base.length:])
+    if not report_progress(progress, full):
+        return None, 0, probes
+    probes += [(full.length, len(full))]
+    if len(full) != 1:
+        return Signature(data, mask), len(full), probes
+    
+    lo = MIN_SIG_LENGTH if len(base) == 1 else MIN_SIG_LENGTH + 1
+    hi = len(data)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        probe = base.copy()
+        probe.extend(data[base.length:mid], mask[base.length:mid])
+        if not report_progress(progress, probe):
+            return None, 0, probes
+        probes += [(mid, len(probe))]
+        if len(probe) == 1:
+            hi = mid
+        else:
+            lo = mid + 1
+            base = probe
+    
+    # Trailing wildcards don't narrow anything down
+    length = hi
+    while mask[length - 1]:
+        length -= 1
+    if align:
+        length = min(instr_end for instr_end in instr_ends if instr_end >= length)
+    return Signature(data[:length], mask[:length]), 1, probes
+
+def shortest_sig_any_offset(cache, data, mask, instr_ends, align=False, progress=None):
+    # Tries a signature starting at every instruction, returns the shortest unique one (None if
+    # there is none) and its offset from the start of the function, or None, None if cancelled.
+    # Once one is found, only prefixes shorter than it are checked for the remaining instructions.
+    best = None
+    best_offset = 0
+    for offset in [0] + instr_ends[:-1]:
+        if mask[offset]:
+            continue
+        ends = [instr_end - offset for instr_end in instr_ends if instr_end > offset]
+        limit = len(data) - offset if best is None else min(len(best) - 1, len(data) - offset)
+        if align:
+            ends = [instr_end for instr_end in ends if instr_end <= limit]
+            if len(ends) == 0:
+                continue
+            limit = ends[-1]
+        if limit < MIN_SIG_LENGTH:
+            continue
+        
+        sig, count, probes = shortest_sig(cache, data[offset:offset + limit], mask[offset:offset + limit], ends, align, progress)
+        if sig is None:
+            return None, None
+        if count == 1:
+            best = sig
+            best_offset = offset
+    return best, best_offset
+
+def match_function(cache, data, mask):
+    # Where a function ended up in another build: the longest prefix of its masked bytes that
+    # still matches somewhere, as long as that is only in one place
+    if len(data) < MIN_SIG_LENGTH:
+        return None
+    base = CandidateSet(cache, Signature(data[:MIN_SIG_LENGTH], mask[:MIN_SIG_LENGTH]))
+    if len(base) == 0:
+        return None
+    full = base.copy()
+    full.extend(data[base.length:], mask[base.length:])
+    if len(full) > 0:
+        base = full
+    
+    lo = base.length
+    hi = len(data) + 1
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        probe = base.copy()
+        probe.extend(data[base.length:mid], mask[base.length:mid])
+        if len(probe) > 0:
+            lo = mid
+            base = probe
+        else:
+            hi = mid
+    addrs = base.addresses()
+    return addrs[0] if len(addrs) == 1 else None
@@ -0,0 +1,81 @@
+from .signature import *
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+def build_automaton(anchors):
+    automaton = ahocorasick.Automaton()
+    for anchor in anchors:
+        # Keys are latin-1 strings so every byte maps to exactly one character
+        automaton.add_word(anchor.decode('latin-1'), anchor)
+    automaton.make_automaton()
+    return automaton
+
+def iter_anchor_hits(cache, region_index, anchors, automaton):
+    # Yields (anchor, offset) for every occurrence of any anchor in the region
+    region = cache.regions[region_index]
+    if cache.index is not None:
+        for anchor in anchors:
+            for offset in cache.index.locate(region_index, anchor):
+                yield anchor, offset
+    elif automaton is not None:
+        # The automaton needs a str, so only a chunk at a time is copied out. Chunks overlap by
+        # the longest anchor and a hit belongs to the chunk it starts in.
+        overlap = max(len(anchor) for anchor in anchors) - 1
+        for chunk_start in range(0, len(region), SCAN_CHUNK_SIZE):
+            chunk_end = min(chunk_start + SCAN_CHUNK_SIZE, len(region))
+            text = region.read(chunk_start, min(chunk_end + overlap, len(region))).decode('latin-1')
+            for end, anchor in automaton.iter(text):
+                offset = chunk_start + end - len(anchor) + 1
+                if offset < chunk_end:
+                    yield anchor, offset
+    else:
+        for anchor in anchors:
+            for offset in iter_find(region, anchor, 0, len(region)):
+                yield anchor, offset
+
+def scan_sigs(cache, sigs, max_results=None):
+    # sigs is a dict or list of (name, Signature), returns a dict of name to matching addresses
+    if isinstance(sigs, dict):
+        sigs = list(sigs.items())
+    results = dict((name, []) for name, sig in sigs)
+    
+    # Signatures that share an anchor run are verified off the same hit
+    by_anchor = {}
+    for name, sig in sigs:
+        if sig.anchor is None:
+            sig.anchor = sig.pick_anchor(cache)
+        anchor_offset, anchor = sig.anchor
+        if len(anchor) == 0:
+            # Nothing to anchor on, the signature is all wildcards
+            for region, offset in sig.iter_region_matches(cache):
+                if max_results is not None and len(results[name]) >= max_results:
+                    break
+                results[name] += [region.start + offset]
+            continue
+        by_anchor.setdefault(anchor, []).append((name, sig, anchor_offset))
+    
+    automaton = None
+    if cache.index is None and ahocorasick is not None and len(by_anchor) > 0:
+        automaton = build_automaton(by_anchor)
+    
+    remaining = sum(len(entries) for entries in by_anchor.values())
+    for region_index in range(len(cache.regions)):
+        region = cache.regions[region_index]
+        for anchor, anchor_hit in iter_anchor_hits(cache, region_index, by_anchor, automaton):
+            for name, sig, anchor_offset in by_anchor[anchor]:
+                matches = results[name]
+                if max_results is not None and len(matches) >= max_results:
+                    continue
+                match_start = anchor_hit - anchor_offset
+                if match_start < 0 or match_start + len(sig) > len(region):
+                    continue
+                if region.match(sig.pattern, match_start):
+                    matches += [region.start + match_start]
+                    if max_results is not None and len(matches) >= max_results:
+                        remaining -= 1
+            if remaining == 0:
+                return results
+    return results
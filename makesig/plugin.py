@@ -0,0 +1,260 @@
+from binaryninja import *
+from .codecache import *
+from .signature import *
+from .generator import *
+from .multiscan import *
+from .function import *
+from .fuzzy import *
+from .rawfile import RawFile
+from .batch import command_make_sigs
+from .validate import command_validate_gamedata
+from .resign import command_resign_gamedata
+
+def find_sig(bv, sig, max_results=1, sections=None):
+    if not isinstance(sig, Signature):
+        sig = Signature.parse(sig)
+    return list(sig.iter_matches(bv, max_results=max_results, sections=sections))
+
+def find_sigs(bv, sigs, max_results=None, sections=None):
+    # Matches every signature in one pass over the code, returns a dict of name to addresses
+    if isinstance(sigs, dict):
+        sigs = list(sigs.items())
+    sigs = [(name, sig if isinstance(sig, Signature) else Signature.parse(sig)) for name, sig in sigs]
+    return scan_sigs(get_code_cache(bv, sections), sigs, max_results)
+
+def find_sig_fuzzy(bv, sig, max_mismatches=None, max_results=10, sections=None):
+    # Closest matches to the signature as (mismatched bytes, address), by default allowing
+    # a quarter of the non-wildcard bytes to differ
+    if not isinstance(sig, Signature):
+        sig = Signature.parse(sig)
+    if max_mismatches is None:
+        max_mismatches = sum(len(run) for offset, run in sig.runs) // 4
+    return fuzzy_search(get_code_cache(bv, sections), sig, max_mismatches, max_results)
+
+def is_good_sig(bv, sig, sections=None):
+    if not isinstance(sig, Signature):
+        sig = Signature.parse(sig)
+    if len(sig) < 5:
+        return False
+    addrs = find_sig(bv, sig, max_results=2, sections=sections)
+    return len(addrs) == 1
+
+def open_build(build, sections=None):
+    # Other builds are either open views or paths to PE/ELF files, returns the file to close
+    if isinstance(build, str):
+        raw = RawFile(build)
+        return build, raw.get_code_cache(sections), raw
+    return build.file.filename, get_code_cache(build, sections), None
+
+def open_builds(bv, others=(), sections=None):
+    # The view followed by every other build, all scoped to the same sections. Returns None
+    # if one of them can't be opened.
+    if sections is None:
+        sections = get_scan_sections(bv)
+    builds = [(bv.file.filename, get_code_cache(bv, sections), None)]
+    for other in others:
+        try:
+            builds += [open_build(other, sections)]
+        except (OSError, ValueError) as e:
+            print('Could not open other build: %s' % e)
+            close_builds(builds)
+            return None
+    return builds
+
+def close_builds(builds):
+    for name, cache, raw in builds:
+        if raw is not None:
+            raw.close()
+
+def sig_for_builds(bv, func, builds, progress=None):
+    data, mask, instr_ends = get_function_bytes(bv, func)
+    sig, counts = grow_sig_all([cache for name, cache, raw in builds], data, mask, instr_ends, progress)
+    if counts is None:
+        return
+    if sig is None:
+        print('Function too short to generate unique signature')
+    elif counts[0] == 0:
+        print('Function is not in an executable segment')
+    elif max(counts) > 1:
+        print('Function too short to generate unique signature')
+    elif 0 in counts:
+        print('%s (not found in %s)' % (sig, ', '.join(name for (name, cache, raw), count in zip(builds, counts) if count == 0)))
+    else:
+        print(sig)
+
+def sig_for_function(bv, func, progress=None, sections=None, others=()):
+    # The signature is grown until it is also unique in every one of the other builds
+    builds = open_builds(bv, others, sections)
+    if builds is None:
+        return
+    try:
+        sig_for_builds(bv, func, builds, progress)
+    finally:
+        close_builds(builds)
+
+def shortest_sig_for_function(bv, func, progress=None, sections=None, any_offset=None):
+    data, mask, instr_ends = get_function_bytes(bv, func)
+    align = Settings().get_bool('makesig.alignShortestSignature', bv)
+    if any_offset is None:
+        any_offset = Settings().get_bool('makesig.searchAllOffsets', bv)
+    if any_offset:
+        sig, offset = shortest_sig_any_offset(get_code_cache(bv, sections), data, mask, instr_ends, align, progress)
+        if sig is not None:
+            print('%s (%i bytes, starts at 0x%x, function start + 0x%x)' % (sig, len(sig), func.start + offset, offset))
+        elif offset is not None:
+            print('Function too short to generate unique signature')
+        return
+    
+    sig, count, probes = shortest_sig(get_code_cache(bv, sections), data, mask, instr_ends, align, progress)
+    for length, probe_count in probes:
+        print('%i bytes: %i matches' % (length, probe_count))
+    if sig is None and len(probes) > 0:
+        return
+    if count != 1:
+        print('Function too short to generate unique signature')
+        return
+    
+    aligned_length = min(instr_end for instr_end in instr_ends if instr_end >= len(sig))
+    print('%s (%i bytes, %i shorter than instruction aligned)' % (sig, len(sig), aligned_length - len(sig)))
+
+class SigTask(BackgroundTaskThread):
+    def __init__(self, msg, bv):
+        BackgroundTaskThread.__init__(self, msg, True)
+        self.msg = msg
+        self.bv = bv
+        self.total = None
+
+    def get_total(self):
+        return sum(len(region) for region in get_code_cache(self.bv).regions)
+
+    def update_progress(self, scanned, candidates):
+        # Counted on the task thread, building the code cache can take a while
+        if self.total is None:
+            self.total = self.get_total()
+        self.progress = '%s (%i/%i bytes scanned, %i candidates)' % (self.msg, scanned, self.total, candidates)
+        return not self.cancelled
+
+class FindSigTask(SigTask):
+    def __init__(self, msg, bv, sig):
+        SigTask.__init__(self, msg, bv)
+        self.sig = sig
+
+    def run(self):
+        addr = next(self.sig.iter_matches(self.bv, progress=self.update_progress), None)
+        if self.cancelled:
+            print('Signature search cancelled')
+        elif addr is None:
+            print('No matches found for signature')
+        else:
+            print('Found match at 0x%x' % addr)
+
+class FuzzyFindSigTask(SigTask):
+    def __init__(self, msg, bv, sig, max_mismatches):
+        SigTask.__init__(self, msg, bv)
+        self.sig = sig
+        self.max_mismatches = max_mismatches
+
+    def run(self):
+        matches = fuzzy_search(get_code_cache(self.bv), self.sig, self.max_mismatches, 10, progress=self.update_progress)
+        if self.cancelled:
+            print('Signature search cancelled')
+        elif len(matches) == 0:
+            print('No matches found for signature')
+        for distance, addr in matches:
+            print('Found match at 0x%x (%i bytes different)' % (addr, distance))
+
+class MakeSigTask(SigTask):
+    def __init__(self, msg, bv, func, shortest):
+        SigTask.__init__(self, msg, bv)
+        self.func = func
+        self.shortest = shortest
+        self.others = [] if shortest else Settings().get_string_list('makesig.otherBuilds', bv)
+
+    def run(self):
+        if self.shortest:
+            shortest_sig_for_function(self.bv, self.func, self.update_progress)
+        else:
+            builds = open_builds(self.bv, self.others)
+            if builds is None:
+                return
+            try:
+                self.total = sum(len(region) for name, cache, raw in builds for region in cache.regions)
+                sig_for_builds(self.bv, self.func, builds, self.update_progress)
+            finally:
+                close_builds(builds)
+        if self.cancelled:
+            print('Signature generation cancelled')
+
+def find_sig_from_input(bv):
+    sig = interaction.get_text_line_input('Signature:', 'Enter signature to search for...')
+    if sig is None:
+        return
+    task = FindSigTask('Searching for signature', bv, Signature.parse(sig))
+    task.start()
+
+def find_sig_fuzzy_from_input(bv):
+    sig = interaction.get_text_line_input('Signature:', 'Enter signature to search for...')
+    if sig is None:
+        return
+    sig = Signature.parse(sig)
+    max_mismatches = interaction.get_int_input('Bytes allowed to differ:', 'Fuzzy signature search')
+    if max_mismatches is None:
+        return
+    task = FuzzyFindSigTask('Searching for near matches of signature', bv, sig, max_mismatches)
+    task.start()
+
+def command_make_sig(bv, func):
+    task = MakeSigTask('Generating signature', bv, func, False)
+    task.start()
+
+def command_make_shortest_sig(bv, func):
+    task = MakeSigTask('Generating shortest signature', bv, func, True)
+    task.start()
+
+Settings().register_group('makesig', 'MakeSig')
+Settings().register_setting('makesig.alignShortestSignature', '''{
+    "title" : "Align shortest signature to instructions",
+    "type" : "boolean",
+    "default" : false,
+    "description" : "Round signatures from the shortest signature command up to the end of an instruction"
+}''')
+Settings().register_setting('makesig.searchAllOffsets', '''{
+    "title" : "Search every offset for the shortest signature",
+    "type" : "boolean",
+    "default" : false,
+    "description" : "Let the shortest signature command start the signature at any instruction in the function rather than only at its start. The offset from the function start is printed with the signature."
+}''')
+Settings().register_setting('makesig.useIndex', '''{
+    "title" : "Use signature index",
+    "type" : "boolean",
+    "default" : false,
+    "description" : "Build a suffix array over the executable segments and save it next to the database, so signature lookups take logarithmic time"
+}''')
+Settings().register_setting('makesig.sections', '''{
+    "title" : "Sections to scan",
+    "type" : "array",
+    "elementType" : "string",
+    "default" : [],
+    "description" : "Only search these sections (e.g. .text) for signatures. When empty, every executable segment is searched."
+}''')
+Settings().register_setting('makesig.scanWorkers', '''{
+    "title" : "Scan threads",
+    "type" : "number",
+    "default" : 0,
+    "description" : "Number of threads to search for signatures with, 0 uses one per CPU. Only used when numpy is installed."
+}''')
+Settings().register_setting('makesig.otherBuilds', '''{
+    "title" : "Other builds",
+    "type" : "array",
+    "elementType" : "string",
+    "default" : [],
+    "description" : "Paths to other builds of the binary (PE or ELF files). Make signature keeps growing the signature until it is unique in all of them too."
+}''')
+
+PluginCommand.register("Find signature", "Searches the current binary for the given signature", find_sig_from_input)
+PluginCommand.register("Find signature (fuzzy)", "Lists the closest matches to the given signature, allowing some bytes to differ", find_sig_fuzzy_from_input)
+PluginCommand.register_for_function("Make signature for current function", "Generates a unique signature for the current selected function", command_make_sig)
+PluginCommand.register_for_function("Make shortest signature for current function", "Generates the shortest unique signature for the current selected function", command_make_shortest_sig)
+PluginCommand.register("Make signatures for all functions", "Generates signatures for every function and saves them as gamedata", command_make_sigs)
+PluginCommand.register("Validate gamedata", "Checks every signature in a SourceMod gamedata file against the current binary", command_validate_gamedata)
+PluginCommand.register("Re-sign gamedata after an update", "Regenerates the gamedata signatures that no longer match, using the old build to find each function", command_resign_gamedata)
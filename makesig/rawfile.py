@@ -0,0 +1,185 @@
+# Signature scanning straight from PE/ELF files, without Binary Ninja. The file is memory
+# mapped and scanned in place. Usage:
+#
+#   python -m makesig.rawfile server.dll "\x55\x8B\xEC\x2A\x2A" -g sdkhooks.games.txt
+from .code import *
+from .multiscan import *
+from .fuzzy import fuzzy_search
+from .gamedata import read_gamedata_sigs
+import argparse
+import mmap
+import struct
+import sys
+
+PE_SCN_MEM_EXECUTE = 0x20000000
+ELF_SHF_EXECINSTR = 0x4
+ELF_SHT_NOBITS = 8
+ELF_PT_LOAD = 1
+ELF_PF_X = 0x1
+
+class RawSection:
+    def __init__(self, name, address, offset, size, executable):
+        self.name = name
+        self.address = address
+        self.offset = offset
+        self.size = size
+        self.executable = executable
+
+class RawFile:
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError('%s is empty' % path)
+        self.sections = []
+        try:
+            if self.data[:2] == b'MZ':
+                self.platform = 'windows'
+                self.parse_pe()
+            elif self.data[:4] == b'\x7fELF':
+                self.platform = 'linux'
+                self.parse_elf()
+            else:
+                raise ValueError('%s is not a PE or ELF file' % path)
+        except struct.error:
+            self.close()
+            raise ValueError('%s is truncated' % path)
+        except:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def parse_pe(self):
+        data = self.data
+        pe = struct.unpack_from('<I', data, 0x3C)[0]
+        if data[pe:pe + 4] != b'PE\0\0':
+            raise ValueError('Invalid PE signature')
+        num_sections, optional_size = struct.unpack_from('<2xH12xH', data, pe + 4)
+        optional = pe + 24
+        if struct.unpack_from('<H', data, optional)[0] == 0x20B:
+            image_base = struct.unpack_from('<Q', data, optional + 24)[0]
+        else:
+            image_base = struct.unpack_from('<I', data, optional + 28)[0]
+        
+        table = optional + optional_size
+        for i in range(num_sections):
+            name, virtual_size, virtual_address, raw_size, raw_offset = struct.unpack_from('<8sIIII', data, table + 40 * i)
+            characteristics = struct.unpack_from('<I', data, table + 40 * i + 36)[0]
+            size = min(virtual_size, raw_size) if virtual_size != 0 else raw_size
+            size = max(min(size, len(data) - raw_offset), 0)
+            self.sections += [RawSection(name.rstrip(b'\0').decode('latin-1'), image_base + virtual_address, raw_offset, size, characteristics & PE_SCN_MEM_EXECUTE != 0)]
+
+    def parse_elf(self):
+        data = self.data
+        is_64 = data[4] == 2
+        endian = '<' if data[5] == 1 else '>'
+        if is_64:
+            phoff, shoff = struct.unpack_from(endian + 'QQ', data, 0x20)
+            phentsize, phnum, shentsize, shnum, shstrndx = struct.unpack_from(endian + 'HHHHH', data, 0x36)
+        else:
+            phoff, shoff = struct.unpack_from(endian + 'II', data, 0x1C)
+            phentsize, phnum, shentsize, shnum, shstrndx = struct.unpack_from(endian + 'HHHHH', data, 0x2A)
+        
+        headers = []
+        for i in range(shnum):
+            if is_64:
+                name, sh_type, flags, addr, offset, size = struct.unpack_from(endian + 'IIQQQQ', data, shoff + i * shentsize)
+            else:
+                name, sh_type, flags, addr, offset, size = struct.unpack_from(endian + 'IIIIII', data, shoff + i * shentsize)
+            headers += [(name, sh_type, flags, addr, offset, size)]
+        
+        if len(headers) > 0:
+            strtab_offset = headers[shstrndx][4] if shstrndx < len(headers) else 0
+            for name, sh_type, flags, addr, offset, size in headers:
+                if sh_type == ELF_SHT_NOBITS or addr == 0:
+                    continue
+                name_end = data.find(b'\0', strtab_offset + name)
+                section_name = data[strtab_offset + name:name_end].decode('latin-1')
+                self.sections += [RawSection(section_name, addr, offset, size, flags & ELF_SHF_EXECINSTR != 0)]
+            return
+        
+        # No section headers, fall back to the loadable segments
+        for i in range(phnum):
+            if is_64:
+                p_type, p_flags, offset, vaddr, paddr, filesz = struct.unpack_from(endian + 'IIQQQQ', data, phoff + i * phentsize)
+            else:
+                p_type, offset, vaddr, paddr, filesz, memsz, p_flags = struct.unpack_from(endian + 'IIIIIII', data, phoff + i * phentsize)
+            if p_type == ELF_PT_LOAD:
+                self.sections += [RawSection('LOAD%i' % i, vaddr, offset, filesz, p_flags & ELF_PF_X != 0)]
+
+    def get_code_cache(self, sections=None):
+        # Regions point straight into the mapping, nothing is copied
+        regions = []
+        for section in self.sections:
+            if (section.name in sections) if sections else section.executable:
+                regions += [CodeRegion(section.address, self.data, section.offset, section.size)]
+        regions.sort(key=lambda region: region.start)
+        return CodeCache(regions)
+
+def read_sig_list(path):
+    # One signature per line, optionally preceded by a name
+    sigs = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if len(line) == 0 or line.startswith('#'):
+                continue
+            parts = line.split(None, 1)
+            sigs += [(parts[0], parts[1]) if len(parts) == 2 else (line, line)]
+    return sigs
+
+def main():
+    parser = argparse.ArgumentParser(description='Find signatures in a PE or ELF file without Binary Ninja')
+    parser.add_argument('binary', help='PE or ELF file to scan')
+    parser.add_argument('sigs', nargs='*', help='signatures in AM format, e.g. \\x55\\x8B\\xEC\\x2A')
+    parser.add_argument('-f', '--file', help='file with one signature per line, optionally preceded by a name')
+    parser.add_argument('-g', '--gamedata', help='SourceMod gamedata file to take signatures from')
+    parser.add_argument('--library', default='server', help='gamedata library to check (default: server)')
+    parser.add_argument('--game', help='gamedata game folder to check, e.g. cstrike (default: only the #default sections)')
+    parser.add_argument('--sections', nargs='+', help='only scan these sections (default: every executable section)')
+    parser.add_argument('--max-results', type=int, default=2, help='addresses to report per signature (default: 2)')
+    parser.add_argument('--mismatches', type=int, help='for signatures that are not found, list the closest matches with up to this many bytes different')
+    args = parser.parse_args()
+    
+    with RawFile(args.binary) as raw:
+        sigs = [(sig, sig) for sig in args.sigs]
+        if args.file:
+            sigs += read_sig_list(args.file)
+        if args.gamedata:
+            for name, sig in sorted(read_gamedata_sigs(args.gamedata, args.library, args.game)[raw.platform].items()):
+                if sig.startswith('@'):
+                    print('%s: symbol lookup, skipped' % name)
+                    continue
+                sigs += [(name, sig)]
+        
+        cache = raw.get_code_cache(args.sections)
+        results = scan_sigs(cache, [(name, Signature.parse(sig)) for name, sig in sigs], args.max_results)
+        failed = 0
+        for name, sig in sigs:
+            addrs = results[name]
+            if len(addrs) == 0:
+                print('%s: not found' % name)
+                if args.mismatches is not None:
+                    for distance, addr in fuzzy_search(cache, Signature.parse(sig), args.mismatches, 5):
+                        print('    0x%x (%i bytes different)' % (addr, distance))
+                failed += 1
+            else:
+                print('%s: %s' % (name, ', '.join('0x%x' % addr for addr in addrs)))
+                if len(addrs) > 1:
+                    failed += 1
+        print('%i/%i signatures matched uniquely' % (len(sigs) - failed, len(sigs)))
+    sys.exit(1 if failed > 0 else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+from binaryninja import *
+from .codecache import *
+from .generator import *
+from .function import *
+from .gamedata import *
+from .validate import check_sigs, get_game_input
+import argparse
+import sys
+
+def find_new_function(old_bv, new_bv, old_addr):
+    # Matches the old function's masked bytes against the new build
+    func = old_bv.get_function_at(old_addr)
+    if func is None:
+        return None
+    data, mask, instr_ends = get_function_bytes(old_bv, func)
+    addr = match_function(get_code_cache(new_bv), data, mask)
+    if addr is None:
+        return None
+    
+    func = new_bv.get_function_at(addr)
+    if func is None:
+        new_bv.add_function(addr)
+        new_bv.update_analysis_and_wait()
+        func = new_bv.get_function_at(addr)
+    return func
+
+def resign_gamedata(old_bv, new_bv, sigs, progress=None):
+    # sigs is {name: signature text} for the old build, only the signatures that broke in the
+    # new build are regenerated. Returns a list of (name, signature) and the names that failed.
+    results = check_sigs(new_bv, sigs)
+    broken = dict((name, text) for name, text in sigs.items() if len(results[name]) != 1)
+    print('%i/%i signatures still match' % (len(sigs) - len(broken), len(sigs)))
+    
+    old_results = check_sigs(old_bv, broken)
+    patch = []
+    failed = []
+    for i, name in enumerate(sorted(broken)):
+        if progress is not None and not progress(i, len(broken)):
+            break
+        if broken[name].startswith('@'):
+            print('%s: symbol not found' % name)
+            failed += [name]
+            continue
+        if len(old_results[name]) != 1:
+            print('%s: signature does not match the old build either' % name)
+            failed += [name]
+            continue
+        
+        func = find_new_function(old_bv, new_bv, old_results[name][0])
+        if func is None:
+            print('%s: function not found in the new build' % name)
+            failed += [name]
+            continue
+        data, mask, instr_ends = get_function_bytes(new_bv, func)
+        sig, count = grow_sig(get_code_cache(new_bv), data, mask, instr_ends)
+        if count != 1:
+            print('%s: could not make a unique signature for 0x%x' % (name, func.start))
+            failed += [name]
+            continue
+        print('%s: 0x%x -> 0x%x %s' % (name, old_results[name][0], func.start, sig))
+        patch += [(name, str(sig))]
+    return patch, failed
+
+def write_resign_results(new_bv, patch, failed, gamedata_path):
+    write_gamedata(gamedata_path, patch, get_platform_name(new_bv))
+    print('Regenerated %i/%i broken signatures' % (len(patch), len(patch) + len(failed)))
+
+class ResignGamedataTask(BackgroundTaskThread):
+    def __init__(self, msg, bv, old_path, gamedata_path, patch_path, game):
+        BackgroundTaskThread.__init__(self, msg, True)
+        self.bv = bv
+        self.old_path = old_path
+        self.gamedata_path = gamedata_path
+        self.patch_path = patch_path
+        self.game = game
+
+    def update_progress(self, done, total):
+        self.progress = 'Re-signing broken signatures (%i/%i)' % (done, total)
+        return not self.cancelled
+
+    def run(self):
+        old_bv = load(self.old_path)
+        try:
+            sigs = read_gamedata_sigs(self.gamedata_path, game=self.game)[get_platform_name(self.bv)]
+            patch, failed = resign_gamedata(old_bv, self.bv, sigs, self.update_progress)
+            write_resign_results(self.bv, patch, failed, self.patch_path)
+        finally:
+            old_bv.file.close()
+
+def command_resign_gamedata(bv):
+    gamedata_path = interaction.get_open_filename_input('Old gamedata file', '*.txt')
+    if not gamedata_path:
+        return
+    game = get_game_input()
+    if game is None:
+        return
+    old_path = interaction.get_open_filename_input('Old binary or database')
+    if not old_path:
+        return
+    patch_path = interaction.get_save_filename_input('Save gamedata patch', 'txt')
+    if not patch_path:
+        return
+    task = ResignGamedataTask('Re-signing gamedata', bv, old_path, gamedata_path, patch_path, game or None)
+    task.start()
+
+def main():
+    parser = argparse.ArgumentParser(description='Regenerate the signatures in a gamedata file that broke in a new build')
+    parser.add_argument('old', help='binary or database the gamedata was made for')
+    parser.add_argument('new', help='updated binary or database')
+    parser.add_argument('gamedata', help='gamedata file for the old build')
+    parser.add_argument('patch', help='gamedata file to write the regenerated signatures to')
+    parser.add_argument('--library', default='server', help='library the signatures belong to (default: server)')
+    parser.add_argument('--game', help='game folder to read signatures for, e.g. cstrike (default: only the #default sections)')
+    args = parser.parse_args()
+    
+    old_bv = load(args.old)
+    new_bv = load(args.new)
+    try:
+        sigs = read_gamedata_sigs(args.gamedata, args.library, args.game)[get_platform_name(new_bv)]
+        patch, failed = resign_gamedata(old_bv, new_bv, sigs)
+        write_resign_results(new_bv, patch, failed, args.patch)
+    finally:
+        old_bv.file.close()
+        new_bv.file.close()
+    sys.exit(1 if len(failed) > 0 else 0)
+
+if __name__ == '__main__':
+    main()
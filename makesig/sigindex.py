@@ -0,0 +1,130 @@
+from array import array
+import hashlib
+import os
+import re
+import struct
+import tempfile
+
+INDEX_MAGIC = b'MSIX'
+INDEX_VERSION = 1
+INDEX_DEPTH = 16
+
+def hash_regions(regions):
+    h = hashlib.sha256()
+    for region in regions:
+        h.update(struct.pack('<QQ', region.start, len(region)))
+        h.update(region.view())
+    return h.digest()
+
+def build_suffix_array(region, depth=INDEX_DEPTH):
+    # Suffixes are sorted on their first `depth` bytes only, one leading byte at a time to keep
+    # peak memory down. Runs longer than that are verified against the data after the lookup.
+    sa = array('I')
+    data = region.data
+    offset = region.offset
+    end = region.offset + len(region)
+    for b in range(256):
+        positions = [m.start() - offset for m in re.compile(re.escape(bytes([b]))).finditer(data, offset, end)]
+        positions.sort(key=lambda p: data[offset + p:min(offset + p + depth, end)])
+        sa.extend(positions)
+    return sa
+
+class SuffixIndex:
+    def __init__(self, regions, digest, arrays, depth=INDEX_DEPTH):
+        self.regions = regions
+        self.digest = digest
+        self.arrays = arrays
+        self.depth = depth
+
+    @classmethod
+    def build(cls, regions):
+        return cls(regions, hash_regions(regions), [build_suffix_array(region) for region in regions])
+
+    @classmethod
+    def load(cls, path, regions):
+        # Returns None if the file is missing, truncated or was built from different bytes
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            if f.read(4) != INDEX_MAGIC:
+                return None
+            header = f.read(44)
+            if len(header) != 44:
+                return None
+            version, depth, digest, region_count = struct.unpack('<II32sI', header)
+            if version != INDEX_VERSION or region_count != len(regions) or digest != hash_regions(regions):
+                return None
+            arrays = []
+            for region in regions:
+                header = f.read(16)
+                if len(header) != 16:
+                    return None
+                start, count = struct.unpack('<QQ', header)
+                # Every offset in the region has a suffix, a short array would miss matches
+                if start != region.start or count != len(region):
+                    return None
+                sa = array('I')
+                raw = f.read(count * sa.itemsize)
+                if len(raw) != count * sa.itemsize:
+                    return None
+                sa.frombytes(raw)
+                arrays += [sa]
+        return cls(regions, digest, arrays, depth)
+
+    def save(self, path):
+        # Written to a temporary file and moved into place, so a load never sees half an index
+        fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(os.path.abspath(path)))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(INDEX_MAGIC)
+                f.write(struct.pack('<II32sI', INDEX_VERSION, self.depth, self.digest, len(self.arrays)))
+                for region, sa in zip(self.regions, self.arrays):
+                    f.write(struct.pack('<QQ', region.start, len(sa)))
+                    f.write(sa.tobytes())
+            os.replace(temp_path, path)
+        except:
+            os.remove(temp_path)
+            raise
+
+    def find_range(self, region_index, run):
+        # Binary search for the block of suffixes starting with run (up to the index depth)
+        region = self.regions[region_index]
+        sa = self.arrays[region_index]
+        key = run[:self.depth]
+        n = len(key)
+        lo = 0
+        hi = len(sa)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if region.read(sa[mid], sa[mid] + n) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        first = lo
+        hi = len(sa)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if region.read(sa[mid], sa[mid] + n) <= key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return first, lo
+
+    def locate(self, region_index, run):
+        # Sorted offsets of every occurrence of run in the region
+        first, last = self.find_range(region_index, run)
+        positions = self.arrays[region_index][first:last]
+        if len(run) > self.depth:
+            region = self.regions[region_index]
+            positions = [p for p in positions if region.startswith(run, p)]
+        return sorted(positions)
+
+    def count(self, run):
+        total = 0
+        for i in range(len(self.regions)):
+            if len(run) > self.depth:
+                total += len(self.locate(i, run))
+            else:
+                first, last = self.find_range(i, run)
+                total += last - first
+        return total
@@ -0,0 +1,213 @@
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import math
+import re
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Anchors this short leave too many candidates to check one at a time, match those with numpy
+NUMPY_MAX_ANCHOR_LENGTH = 3
+
+# Scans report progress and check for cancellation after every chunk
+SCAN_CHUNK_SIZE = 1 << 20
+
+def iter_find(region, sub, start, end):
+    data = region.data
+    offset = region.offset
+    start += offset
+    end = offset + min(end, len(region))
+    while True:
+        start = data.find(sub, start, end)
+        if start == -1:
+            return
+        yield start - offset
+        start += 1
+
+def get_literal_runs(data, mask):
+    runs = []
+    run_start = None
+    for i in range(len(data)):
+        if mask[i]:
+            if run_start is not None:
+                runs += [(run_start, bytes(data[run_start:i]))]
+                run_start = None
+        elif run_start is None:
+            run_start = i
+    if run_start is not None:
+        runs += [(run_start, bytes(data[run_start:]))]
+    return runs
+
+class Signature:
+    def __init__(self, data, mask):
+        # data holds the signature bytes, mask is 1 for every wildcarded byte
+        self.data = bytes(b if not m else 0 for b, m in zip(data, mask))
+        self.mask = bytes(mask)
+        self.runs = get_literal_runs(self.data, self.mask)
+        
+        pattern = b''
+        last_end = 0
+        for offset, run in self.runs:
+            if offset > last_end:
+                pattern += b'.{%i}' % (offset - last_end)
+            pattern += re.escape(run)
+            last_end = offset + len(run)
+        if len(self) > last_end:
+            pattern += b'.{%i}' % (len(self) - last_end)
+        self.pattern = re.compile(pattern, re.DOTALL)
+        self.anchor = None
+        self.literal_order = None
+
+    @classmethod
+    def parse(cls, text):
+        # AM format, e.g. \x55\x8B\xEC\x2A where \x2A (*) is a wildcard
+        if isinstance(text, bytes):
+            text = text.decode('latin-1')
+        text = text.strip().encode('latin-1').decode('unicode_escape')
+        data = bytearray()
+        mask = bytearray()
+        for c in text:
+            if c == '*':
+                data.append(0)
+                mask.append(1)
+            else:
+                data.append(ord(c))
+                mask.append(0)
+        return cls(data, mask)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __str__(self):
+        return ''.join('\\x2A' if self.mask[i] else '\\x%02X' % self.data[i] for i in range(len(self)))
+
+    def __repr__(self):
+        return 'Signature(\'%s\')' % self
+
+    def pick_anchor(self, cache):
+        # With an index the exact number of occurrences of every run is cheap to get
+        if cache.index is not None:
+            best = (0, b'')
+            best_count = 0
+            for offset, run in self.runs:
+                count = cache.index.count(run)
+                if best[1] == b'' or count < best_count:
+                    best = (offset, run)
+                    best_count = count
+            return best
+        
+        freqs = cache.get_byte_freqs()
+        total = sum(freqs) + 256
+        
+        # Pick the run with the lowest expected number of occurrences, treating bytes as independent
+        best = (0, b'')
+        best_score = 0
+        for offset, run in self.runs:
+            score = sum(math.log((freqs[b] + 1) / total) for b in run)
+            if best[1] == b'' or score < best_score:
+                best = (offset, run)
+                best_score = score
+        return best
+
+    def iter_region_chunks(self, cache, start=None, end=None):
+        # Splits the offsets where a match may begin into chunks, matching reads up to the
+        # signature length past the end of its chunk so matches across chunk edges aren't lost
+        anchor_offset, anchor = self.anchor
+        for region_index in range(len(cache.regions)):
+            region = cache.regions[region_index]
+            lo = 0 if start is None else max(start - region.start, 0)
+            hi = len(region) if end is None else min(end - region.start, len(region))
+            hi -= len(self)
+            if lo > hi:
+                continue
+            
+            index_hits = None
+            if cache.index is not None and len(anchor) > 0:
+                index_hits = cache.index.locate(region_index, anchor)
+            for chunk_start in range(lo, hi + 1, SCAN_CHUNK_SIZE):
+                yield region, chunk_start, min(chunk_start + SCAN_CHUNK_SIZE, hi + 1), index_hits
+
+    def find_chunk_matches(self, cache, region, lo, hi, index_hits, use_numpy):
+        if use_numpy:
+            return self.find_numpy_matches(cache, region, lo, hi)
+        # Search on the rarest literal run and check the rest of the signature around it
+        anchor_offset, anchor = self.anchor
+        if index_hits is not None:
+            anchor_hits = index_hits[bisect_left(index_hits, lo + anchor_offset):bisect_left(index_hits, hi + anchor_offset)]
+        else:
+            anchor_hits = iter_find(region, anchor, lo + anchor_offset, hi - 1 + anchor_offset + len(anchor))
+        return (hit - anchor_offset for hit in anchor_hits if region.match(self.pattern, hit - anchor_offset))
+
+    def iter_region_matches(self, cache, start=None, end=None, progress=None):
+        # progress(bytes_scanned, matches) is called after every chunk, returning False stops the scan
+        if self.anchor is None:
+            self.anchor = self.pick_anchor(cache)
+        anchor_offset, anchor = self.anchor
+        # numpy is the only matcher that lets go of the GIL, so it is the only one worth running
+        # on several threads and is then used whatever the anchor length
+        threaded = cache.index is None and numpy is not None and cache.workers > 1
+        use_numpy = cache.index is None and numpy is not None and (threaded or len(anchor) <= NUMPY_MAX_ANCHOR_LENGTH)
+        
+        chunks = self.iter_region_chunks(cache, start, end)
+        if threaded:
+            results = self.iter_threaded_matches(cache, chunks)
+        else:
+            results = ((region, lo, hi, self.find_chunk_matches(cache, region, lo, hi, index_hits, use_numpy)) for region, lo, hi, index_hits in chunks)
+        
+        scanned = 0
+        found = 0
+        for region, lo, hi, matches in results:
+            for match_start in matches:
+                yield region, match_start
+                found += 1
+            scanned += hi - lo
+            if progress is not None and not progress(scanned, found):
+                return
+
+    def iter_threaded_matches(self, cache, chunks):
+        # Chunks are handed out in address order with only a few in flight, so results come
+        # back in order and stopping early only waits on those
+        with ThreadPoolExecutor(cache.workers) as executor:
+            pending = deque()
+            try:
+                for region, lo, hi, index_hits in chunks:
+                    pending.append((region, lo, hi, executor.submit(self.find_numpy_matches, cache, region, lo, hi)))
+                    if len(pending) >= cache.workers * 2:
+                        region, lo, hi, future = pending.popleft()
+                        yield region, lo, hi, future.result()
+                while len(pending) > 0:
+                    region, lo, hi, future = pending.popleft()
+                    yield region, lo, hi, future.result()
+            finally:
+                for region, lo, hi, future in pending:
+                    future.cancel()
+
+    def find_numpy_matches(self, cache, region, lo, hi):
+        # Check one signature byte at a time across every candidate offset in [lo, hi), rarest
+        # bytes first, dropping candidates as they fail
+        if self.literal_order is None:
+            freqs = cache.get_byte_freqs()
+            self.literal_order = sorted((i for i in range(len(self)) if not self.mask[i]), key=lambda i: freqs[self.data[i]])
+        code = numpy.frombuffer(region.data, dtype=numpy.uint8, count=len(region), offset=region.offset)
+        
+        if len(self.literal_order) == 0:
+            return list(range(lo, hi))
+        i = self.literal_order[0]
+        candidates = numpy.flatnonzero(code[lo + i:hi + i] == self.data[i]) + lo
+        for i in self.literal_order[1:]:
+            if candidates.size == 0:
+                break
+            candidates = candidates[code[candidates + i] == self.data[i]]
+        return candidates.tolist()
+
+    def iter_matches(self, bv, start=None, end=None, max_results=None, progress=None, sections=None):
+        from .codecache import get_code_cache
+        count = 0
+        for region, offset in self.iter_region_matches(get_code_cache(bv, sections), start, end, progress):
+            yield region.start + offset
+            count += 1
+            if max_results is not None and count >= max_results:
+                return
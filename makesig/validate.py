@@ -0,0 +1,112 @@
+from binaryninja import *
+from concurrent.futures import ProcessPoolExecutor
+from .codecache import *
+from .multiscan import *
+from .gamedata import *
+import argparse
+import multiprocessing
+import os
+import sys
+
+def check_sigs(bv, sigs):
+    # sigs is {name: signature text}, returns {name: addresses} with at most 2 addresses each
+    results = {}
+    byte_sigs = []
+    for name, text in sigs.items():
+        if text.startswith('@'):
+            # Symbol lookup rather than a byte signature
+            symbol = bv.get_symbol_by_raw_name(text[1:])
+            results[name] = [] if symbol is None else [symbol.address]
+        else:
+            byte_sigs += [(name, Signature.parse(text))]
+    results.update(scan_sigs(get_code_cache(bv), byte_sigs, max_results=2))
+    return results
+
+def report_results(platform, results):
+    failed = 0
+    for name in sorted(results):
+        addrs = results[name]
+        if len(addrs) == 0:
+            print('[%s] %s: not found' % (platform, name))
+            failed += 1
+        elif len(addrs) > 1:
+            print('[%s] %s: not unique (0x%x, 0x%x, ...)' % (platform, name, addrs[0], addrs[1]))
+            failed += 1
+    print('[%s] %i/%i signatures OK' % (platform, len(results) - failed, len(results)))
+    return failed
+
+def check_binary_job(job):
+    platform, path, sigs = job
+    bv = load(path, update_analysis=False)
+    try:
+        return platform, check_sigs(bv, sigs)
+    finally:
+        bv.file.close()
+
+def validate_gamedata(gamedata_path, binaries, library='server', game=None):
+    # binaries is {platform: path}, each binary is opened and checked in its own worker process
+    sigs = read_gamedata_sigs(gamedata_path, library, game)
+    jobs = [(platform, path, sigs[platform]) for platform, path in binaries.items() if len(sigs[platform]) > 0]
+    results = {}
+    if len(jobs) > 0:
+        # Spawned rather than forked, the Binary Ninja core isn't safe to use after a fork
+        with ProcessPoolExecutor(len(jobs), mp_context=multiprocessing.get_context('spawn')) as executor:
+            for platform, platform_results in executor.map(check_binary_job, jobs):
+                results[platform] = platform_results
+    return results
+
+class ValidateGamedataTask(BackgroundTaskThread):
+    def __init__(self, msg, bv, gamedata_path, game):
+        BackgroundTaskThread.__init__(self, msg, True)
+        self.bv = bv
+        self.gamedata_path = gamedata_path
+        self.game = game
+
+    def run(self):
+        platform = get_platform_name(self.bv)
+        sigs = read_gamedata_sigs(self.gamedata_path, game=self.game)[platform]
+        report_results(platform, check_sigs(self.bv, sigs))
+
+def get_game_input():
+    # Returns the game folder, '' for only the #default sections or None if cancelled
+    return interaction.get_text_line_input('Game folder (e.g. cstrike), empty for #default only:', 'Gamedata game')
+
+def command_validate_gamedata(bv):
+    path = interaction.get_open_filename_input('Gamedata file', '*.txt')
+    if not path:
+        return
+    game = get_game_input()
+    if game is None:
+        return
+    task = ValidateGamedataTask('Validating gamedata', bv, path, game or None)
+    task.start()
+
+def main():
+    parser = argparse.ArgumentParser(description='Check every signature in a SourceMod gamedata file against the game binaries')
+    parser.add_argument('gamedata', help='gamedata .txt file')
+    parser.add_argument('--library', default='server', help='library the signatures belong to (default: server)')
+    parser.add_argument('--game', help='game folder to read signatures for, e.g. cstrike (default: only the #default sections)')
+    parser.add_argument('--dir', help='directory holding the binaries, e.g. server.dll and server_srv.so')
+    for platform in PLATFORMS:
+        parser.add_argument('--%s' % platform, help='%s binary or database' % platform)
+    args = parser.parse_args()
+    
+    binaries = {}
+    for platform in PLATFORMS:
+        path = getattr(args, platform)
+        if path is None and args.dir is not None:
+            path = os.path.join(args.dir, get_library_filename(args.library, platform))
+            if not os.path.exists(path):
+                path = None
+        if path is not None:
+            binaries[platform] = path
+    
+    failed = 0
+    results = validate_gamedata(args.gamedata, binaries, args.library, args.game)
+    for platform in PLATFORMS:
+        if platform in results:
+            failed += report_results(platform, results[platform])
+    sys.exit(1 if failed > 0 else 0)
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,10 @@
 from binaryninja import *
+import struct
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 def read_ptr(bv, br):
     if bv.address_size == 4: return br.read32()
@@ -32,126 +38,295 @@ def get_class_name(bv, name):
     
     return name
 
-def is_vtable_func(bv, addr):
-    segment = bv.get_segment_at(addr)
-    return segment and segment.executable
+def read_words(bv, section):
+    # The whole section as pointer sized words, along with its bytes
+    data = bv.read(section.start, len(section))
+    count = len(data) // bv.address_size
+    if numpy is not None:
+        return data, numpy.frombuffer(data, dtype='<u%i' % bv.address_size, count=count)
+    return data, struct.unpack('<%i%s' % (count, 'I' if bv.address_size == 4 else 'Q'), data[:count * bv.address_size])
 
-def is_complete_object_locator(bv, addr):
-    rdata = bv.sections['.rdata']
-    if rdata.start < addr and addr < rdata.end:
-        br = BinaryReader(bv)
-        br.seek(addr)
-        signature = br.read32()
-        return signature == 0
+def get_executable_ranges(bv):
+    return [(segment.start, segment.end) for segment in bv.segments if segment.executable]
+
+def is_executable(ranges, addr):
+    for start, end in ranges:
+        if start <= addr and addr < end:
+            return True
     return False
 
+def find_vtable_candidates(bv, rdata, data, words):
+    # Indices of words that point at a zero dword in .rdata (a complete object locator's
+    # signature) and are followed by a pointer into an executable segment
+    ranges = get_executable_ranges(bv)
+    if numpy is None:
+        candidates = []
+        for i in range(len(words) - 1):
+            col = words[i]
+            if rdata.start < col and col <= rdata.end - 4 and is_executable(ranges, words[i + 1]) and data[col - rdata.start:col - rdata.start + 4] == b'\0\0\0\0':
+                candidates += [i]
+        return candidates
+    
+    cols = words[:-1]
+    funcs = words[1:]
+    mask = (cols > rdata.start) & (cols <= rdata.end - 4)
+    func_mask = numpy.zeros(len(funcs), dtype=bool)
+    for start, end in ranges:
+        func_mask |= (funcs >= start) & (funcs < end)
+    candidates = numpy.flatnonzero(mask & func_mask)
+    
+    code = numpy.frombuffer(data, dtype=numpy.uint8)
+    offsets = cols[candidates].astype(numpy.int64) - rdata.start
+    signature = code[offsets] | code[offsets + 1] | code[offsets + 2] | code[offsets + 3]
+    return candidates[signature == 0].tolist()
+
+def find_type_descriptors(bv):
+    # The mangled class name follows the vtable and spare pointers of the type descriptor
+    typedescs = []
+    for segment in bv.segments:
+        if segment.executable:
+            continue
+        data = bv.read(segment.start, len(segment))
+        for prefix in [ b'.?AV', b'.?AU' ]:
+            i = data.find(prefix, 2 * bv.address_size)
+            while i != -1:
+                typedescs += [segment.start + i - 2 * bv.address_size]
+                i = data.find(prefix, i + 1)
+    return typedescs
+
+def build_pointer_index(words, targets):
+    # Reverse index from each target address to the indices of the words pointing at it
+    if numpy is not None:
+        hits = numpy.flatnonzero(numpy.isin(words, numpy.array(targets, dtype=words.dtype))).tolist()
+    else:
+        targets = set(targets)
+        hits = [i for i in range(len(words)) if words[i] in targets]
+    pointer_index = {}
+    for i in hits:
+        pointer_index.setdefault(int(words[i]), []).append(i)
+    return pointer_index
+
+def find_vtables_from_type_descriptors(bv, rdata, words):
+    # Follows type descriptor -> complete object locator -> vtable through the pointers in
+    # .rdata, so only words pointing at those structures are ever looked at one by one
+    ranges = get_executable_ranges(bv)
+    typedescs = find_type_descriptors(bv)
+    typedesc_refs = build_pointer_index(words, typedescs)
+    cols = []
+    for typedesc in typedescs:
+        for i in typedesc_refs.get(typedesc, []):
+            # pTypeDescriptor is at +0xC in the locator, which starts with a zero signature
+            col_index = i - 0xC // bv.address_size
+            if col_index >= 0 and words[col_index] == 0:
+                cols += [rdata.start + col_index * bv.address_size]
+    
+    col_refs = build_pointer_index(words, cols)
+    candidates = set()
+    for col in cols:
+        for index in col_refs.get(col, []):
+            if index + 1 < len(words) and is_executable(ranges, int(words[index + 1])):
+                candidates.add(index)
+    return sorted(candidates)
+
+def get_type_cache(bv):
+    # RTTI types are only built once per scan of a view, the structures are defined as named
+    # types and referred to by name everywhere they are used
+    types = bv.session_data.get('rtti_types')
+    if types is None:
+        types = {}
+        bv.session_data['rtti_types'] = types
+    return types
+
+def cached_type(bv, key, create):
+    types = get_type_cache(bv)
+    if key not in types:
+        types[key] = create()
+    return types[key]
+
+def define_named_type(bv, name, struct):
+    if bv.session_data.get('rtti_auto_changes'):
+        bv.define_type(Type.generate_auto_type_id('rtti', name), name, Type.structure_type(struct))
+    else:
+        bv.define_user_type(name, Type.structure_type(struct))
+    return Type.named_type_from_registered_type(bv, name)
+
+def define_symbol(bv, symbol):
+    # Auto symbols aren't recorded for undo
+    if bv.session_data.get('rtti_auto_changes'):
+        bv.define_auto_symbol(symbol)
+    else:
+        bv.define_user_symbol(symbol)
+
 def vtable_t(bv, count):
-    return Type.array(Type.pointer(bv.arch, Type.void()), count)
+    return cached_type(bv, ('vtable_t', count), lambda: Type.array(Type.pointer(bv.arch, Type.void()), count))
 
 def type_descriptor_t(bv, str_size):
-    with StructureBuilder.builder(bv, 'type_descriptor_t') as type_descriptor_struct:
+    def create():
+        type_descriptor_struct = StructureBuilder.create()
         type_descriptor_struct.append(Type.pointer(bv.arch, Type.void()), 'vtable')
         type_descriptor_struct.append(Type.pointer(bv.arch, Type.void()), 'runtime_ref')
         type_descriptor_struct.append(Type.array(Type.int(1), str_size), 'name')
         return Type.structure_type(type_descriptor_struct)
+    return cached_type(bv, ('type_descriptor_t', str_size), create)
 
 def base_class_desc_t(bv):
-    with StructureBuilder.builder(bv, 'base_class_desc_t') as base_class_desc_struct:
+    def create():
+        base_class_desc_struct = StructureBuilder.create()
         base_class_desc_struct.append(Type.pointer(bv.arch, Type.void()), 'pTypeDescriptor')
         base_class_desc_struct.append(Type.int(4, False), 'numContainedBases')
         base_class_desc_struct.append(Type.int(4), 'mdisp')
         base_class_desc_struct.append(Type.int(4), 'pdisp')
         base_class_desc_struct.append(Type.int(4), 'vdisp')
         base_class_desc_struct.append(Type.int(4, False), 'attributes')
-        return Type.structure_type(base_class_desc_struct)
+        return define_named_type(bv, 'base_class_desc_t', base_class_desc_struct)
+    return cached_type(bv, 'base_class_desc_t', create)
+
+def base_class_array_t(bv, count):
+    return cached_type(bv, ('base_class_array_t', count), lambda: Type.array(Type.pointer(bv.arch, base_class_desc_t(bv)), count))
 
 def class_hierarchy_desc_t(bv):
-    with StructureBuilder.builder(bv, 'class_hierarchy_desc_t') as class_hierarchy_desc_struct:
+    def create():
+        class_hierarchy_desc_struct = StructureBuilder.create()
         class_hierarchy_desc_struct.append(Type.int(4, False), 'signature')
         class_hierarchy_desc_struct.append(Type.int(4, False), 'attributes')
         class_hierarchy_desc_struct.append(Type.int(4, False), 'numBaseClasses')
         class_hierarchy_desc_struct.append(Type.pointer(bv.arch, base_class_desc_t(bv)), 'pBaseClassArray')
-        return Type.structure_type(class_hierarchy_desc_struct)
+        return define_named_type(bv, 'class_hierarchy_desc_t', class_hierarchy_desc_struct)
+    return cached_type(bv, 'class_hierarchy_desc_t', create)
 
 def complete_object_locator_t(bv):
-    with StructureBuilder.builder(bv, 'complete_object_locator_t') as complete_object_locator_struct:
+    def create():
+        complete_object_locator_struct = StructureBuilder.create()
         complete_object_locator_struct.append(Type.int(4, False), 'signature')
         complete_object_locator_struct.append(Type.int(4, False), 'offset')
         complete_object_locator_struct.append(Type.int(4, False), 'cdOffset')
         complete_object_locator_struct.append(Type.pointer(bv.arch, Type.void()), 'pTypeDescriptor')
         complete_object_locator_struct.append(Type.pointer(bv.arch, class_hierarchy_desc_t(bv)), 'pClassDescriptor')
-        return Type.structure_type(complete_object_locator_struct)
+        return define_named_type(bv, 'complete_object_locator_t', complete_object_locator_struct)
+    return cached_type(bv, 'complete_object_locator_t', create)
 
-def find_rtti(bv):
+def complete_object_locator_ptr_t(bv):
+    return cached_type(bv, 'complete_object_locator_ptr_t', lambda: Type.pointer(bv.arch, complete_object_locator_t(bv)))
+
+def define_rtti(bv, from_type_descriptors=None, undo=None):
+    # Returns the functions the vtables point at
+    if from_type_descriptors is None:
+        from_type_descriptors = Settings().get_bool('rtti.findFromTypeDescriptors', bv)
+    # Types from an earlier scan may have been undone since
+    bv.session_data['rtti_types'] = None
     rdata = bv.sections['.rdata']
+    data, words = read_words(bv, rdata)
+    ranges = get_executable_ranges(bv)
     br = BinaryReader(bv)
-    br.seek(rdata.start)
     vtable_count = 0
-    while br.offset < rdata.end:
-        p_col = br.offset
-        col = read_ptr(bv, br)
-        if col == None:
-            break
-            
-        p_vtable = br.offset
-        vtable_func = read_ptr(bv, br)
-        if vtable_func == None:
-            break
-            
-        if is_complete_object_locator(bv, col) and is_vtable_func(bv, vtable_func):
-            vtable_count += 1
-            # Define complete object locator
-            bv.define_data_var(p_col, Type.pointer(bv.arch, complete_object_locator_t(bv)))
-            bv.define_data_var(col, complete_object_locator_t(bv))
-            
-            # Define type descriptor
-            br.seek(col + 0xC)
-            typedesc = read_ptr(bv, br)
-            mangled_name = bv.get_string_at(typedesc + 8)
-            vtable_name = demangle_vtable_name(bv, mangled_name.value)
-            class_name = get_class_name(bv, mangled_name.value)
-            bv.define_data_var(typedesc, type_descriptor_t(bv, mangled_name.length))
-            typedesc_name = '%s::`RTTI Type Descriptor\'' % class_name
-            bv.define_user_symbol(Symbol(SymbolType.DataSymbol, typedesc, typedesc_name, raw_name='%s_%i' % (typedesc_name, vtable_count)))
-            print('[%i] vtable at : 0x%0x (%s)' % (vtable_count, p_vtable, vtable_name))
-            
-            # Now that we have the class name, rename complete object locator to something more suitable
-            p_col_name = 'locator_%s' % class_name
-            bv.define_user_symbol(Symbol(SymbolType.DataSymbol, p_col, p_col_name, raw_name='%s_%i' % (p_col_name, vtable_count)))
-            col_name = '%s::`RTTI Complete Object Locator\'' % class_name
-            bv.define_user_symbol(Symbol(SymbolType.DataSymbol, col, col_name, raw_name='%s_%i' % (col_name, vtable_count)))
-            
-            # Define class hierarchy desc
-            br.seek(col + 0x10)
-            classhier = read_ptr(bv, br)
-            bv.define_data_var(classhier, class_hierarchy_desc_t(bv))
-            hierdesc_name = '%s::`RTTI Class Hierarchy Descriptor\'' % class_name
-            bv.define_user_symbol(Symbol(SymbolType.DataSymbol, classhier, hierdesc_name, raw_name='%s_%i' % (hierdesc_name, vtable_count)))
-            
-            # Define base class array
-            br.seek(classhier + 8)
-            num_baseclasses = br.read32()
-            baseclasses = read_ptr(bv, br)
-            bv.define_data_var(baseclasses, Type.array(Type.pointer(bv.arch, base_class_desc_t(bv)), num_baseclasses))
-            baseclasses_name = '%s::`RTTI Base Class Array\'' % class_name
-            bv.define_user_symbol(Symbol(SymbolType.DataSymbol, baseclasses, baseclasses_name, raw_name='%s_%i' % (baseclasses_name, vtable_count)))
-            
-            # Count number of functions in vtable and mark as array
-            br.seek(p_vtable)
-            vfunc_count = 0
-            while True:
-                vtable_func = read_ptr(bv, br)
-                if not is_vtable_func(bv, vtable_func):
-                    break
-                vfunc_count += 1
-                bv.add_function(vtable_func)
-            bv.define_data_var(p_vtable, vtable_t(bv, vfunc_count))
-            bv.define_user_symbol(Symbol(SymbolType.DataSymbol, p_vtable, vtable_name, raw_name='%s_%i' % (vtable_name, vtable_count)))
+    vtable_funcs = set()
+    next_index = 0
+    if from_type_descriptors:
+        candidates = find_vtables_from_type_descriptors(bv, rdata, words)
+    else:
+        candidates = find_vtable_candidates(bv, rdata, data, words)
+    for index in candidates:
+        if index < next_index:
+            continue
+        p_col = rdata.start + index * bv.address_size
+        p_vtable = p_col + bv.address_size
+        col = int(words[index])
+        
+        vtable_count += 1
+        # Define complete object locator
+        bv.define_data_var(p_col, complete_object_locator_ptr_t(bv))
+        bv.define_data_var(col, complete_object_locator_t(bv))
+        
+        # Define type descriptor
+        br.seek(col + 0xC)
+        typedesc = read_ptr(bv, br)
+        mangled_name = bv.get_string_at(typedesc + 8)
+        vtable_name = demangle_vtable_name(bv, mangled_name.value)
+        class_name = get_class_name(bv, mangled_name.value)
+        bv.define_data_var(typedesc, type_descriptor_t(bv, mangled_name.length))
+        typedesc_name = '%s::`RTTI Type Descriptor\'' % class_name
+        define_symbol(bv, Symbol(SymbolType.DataSymbol, typedesc, typedesc_name, raw_name='%s_%i' % (typedesc_name, vtable_count)))
+        print('[%i] vtable at : 0x%0x (%s)' % (vtable_count, p_vtable, vtable_name))
+        
+        # Now that we have the class name, rename complete object locator to something more suitable
+        p_col_name = 'locator_%s' % class_name
+        define_symbol(bv, Symbol(SymbolType.DataSymbol, p_col, p_col_name, raw_name='%s_%i' % (p_col_name, vtable_count)))
+        col_name = '%s::`RTTI Complete Object Locator\'' % class_name
+        define_symbol(bv, Symbol(SymbolType.DataSymbol, col, col_name, raw_name='%s_%i' % (col_name, vtable_count)))
         
-        # The last vtable func check failed, back up in case this is a locator
-        br.offset -= 4
+        # Define class hierarchy desc
+        br.seek(col + 0x10)
+        classhier = read_ptr(bv, br)
+        bv.define_data_var(classhier, class_hierarchy_desc_t(bv))
+        hierdesc_name = '%s::`RTTI Class Hierarchy Descriptor\'' % class_name
+        define_symbol(bv, Symbol(SymbolType.DataSymbol, classhier, hierdesc_name, raw_name='%s_%i' % (hierdesc_name, vtable_count)))
+        
+        # Define base class array
+        br.seek(classhier + 8)
+        num_baseclasses = br.read32()
+        baseclasses = read_ptr(bv, br)
+        bv.define_data_var(baseclasses, base_class_array_t(bv, num_baseclasses))
+        baseclasses_name = '%s::`RTTI Base Class Array\'' % class_name
+        define_symbol(bv, Symbol(SymbolType.DataSymbol, baseclasses, baseclasses_name, raw_name='%s_%i' % (baseclasses_name, vtable_count)))
+        
+        # Count number of functions in vtable and mark as array
+        vfunc_count = 0
+        while index + 1 + vfunc_count < len(words):
+            vtable_func = int(words[index + 1 + vfunc_count])
+            if not is_executable(ranges, vtable_func):
+                break
+            vfunc_count += 1
+            vtable_funcs.add(vtable_func)
+        bv.define_data_var(p_vtable, vtable_t(bv, vfunc_count))
+        define_symbol(bv, Symbol(SymbolType.DataSymbol, p_vtable, vtable_name, raw_name='%s_%i' % (vtable_name, vtable_count)))
+        
+        # Carry on scanning from the end of the vtable
+        next_index = index + 1 + vfunc_count
+        if undo is not None:
+            undo.step()
     
-    print('Found %i vtables' % vtable_count)\
+    print('Found %i vtables' % vtable_count)
+    return vtable_funcs
+
+def find_rtti(bv, from_type_descriptors=None, undo=None, auto_changes=False):
+    # Analysis is held for the whole scan and the vtable functions are added in one go at the
+    # end, shared ones like _purecall only once. With auto_changes everything is defined as
+    # auto analysis would, which isn't recorded for undo.
+    bv.session_data['rtti_auto_changes'] = auto_changes
+    bv.set_analysis_hold(True)
+    try:
+        vtable_funcs = define_rtti(bv, from_type_descriptors, undo)
+        for vtable_func in sorted(vtable_funcs):
+            bv.add_function(vtable_func)
+    finally:
+        bv.set_analysis_hold(False)
+    print('Added %i vtable functions' % len(vtable_funcs))
+    bv.update_analysis()
+
+class UndoChunks:
+    # Records the scan for undo, committing every chunk_size vtables so one undo entry never
+    # holds the whole scan. A chunk size of 0 makes the whole scan a single entry.
+    def __init__(self, bv, chunk_size):
+        self.bv = bv
+        self.chunk_size = chunk_size
+        self.count = 0
+        self.state = None
+
+    def __enter__(self):
+        self.state = self.bv.begin_undo_actions()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.bv.commit_undo_actions(self.state)
+        else:
+            self.bv.revert_undo_actions(self.state)
+
+    def step(self):
+        self.count += 1
+        if self.chunk_size > 0 and self.count % self.chunk_size == 0:
+            self.bv.commit_undo_actions(self.state)
+            self.state = self.bv.begin_undo_actions()
 
 class ScanRtti(BackgroundTaskThread):
     def __init__(self, msg, bv):
@@ -159,11 +334,34 @@ class ScanRtti(BackgroundTaskThread):
         self.bv = bv
 
     def run(self):
-        with self.bv.undoable_transaction():
-            find_rtti(self.bv)
+        if Settings().get_bool('rtti.autoChanges', self.bv):
+            find_rtti(self.bv, auto_changes=True)
+            return
+        with UndoChunks(self.bv, Settings().get_integer('rtti.undoChunkSize', self.bv)) as undo:
+            find_rtti(self.bv, undo=undo)
 
 def command_scan_rtti(bv):
     task = ScanRtti('Scanning RTTI', bv)
     task.start()
 
+Settings().register_group('rtti', 'RTTI')
+Settings().register_setting('rtti.findFromTypeDescriptors', '''{
+    "title" : "Find RTTI from type descriptors",
+    "type" : "boolean",
+    "default" : false,
+    "description" : "Find vtables by following pointers back from the .?AV/.?AU type descriptor names instead of testing every word in .rdata. Faster on large binaries, and only finds classes whose type descriptor is intact."
+}''')
+Settings().register_setting('rtti.undoChunkSize', '''{
+    "title" : "Vtables per undo entry",
+    "type" : "number",
+    "default" : 0,
+    "description" : "Commit the scan for undo every this many vtables, which bounds the memory used by undo on large binaries. 0 makes the whole scan a single undo entry."
+}''')
+Settings().register_setting('rtti.autoChanges', '''{
+    "title" : "Define RTTI as auto analysis",
+    "type" : "boolean",
+    "default" : false,
+    "description" : "Define the RTTI symbols and types as auto analysis rather than user changes. Nothing is recorded for undo, which is useful for headless runs."
+}''')
+
 PluginCommand.register('Scan RTTI', 'Scans for MSVC RTTI', command_scan_rtti)
\ No newline at end of file